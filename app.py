@@ -1,12 +1,68 @@
-from llm import LLMClient
+import asyncio
+
+from llm import get_llm_client
+
+llm = get_llm_client()
+
+SYSTEM_PROMPT = "You are a helpful AI assistant."
+SYSTEM = ({"role": "system", "content": SYSTEM_PROMPT},)
+
+# Only the most recent turns are sent to the LLM (one turn = user + assistant)
+WINDOW_TURNS = 6
+
+# Once history reaches SUMMARIZE_AT messages, everything except the last
+# KEEP_MESSAGES is folded into a running summary and dropped. Folding must
+# happen before history outgrows the window (the next user message would
+# push the oldest message out), or those messages would be in neither
+SUMMARIZE_AT = 2 * WINDOW_TURNS
+KEEP_MESSAGES = 8
+
+SUMMARY_INSTRUCTION = (
+    "Summarize the prior conversation in <=200 tokens, "
+    "preserving names, instructions, facts."
+)
+
+
+def build_messages(history, summary=""):
+    """
+    Build the prompt: system message (plus summary, if any) and recent turns.
+    Only the fixed-size window is copied, never the whole history.
+    """
+    head = SYSTEM
+    if summary:
+        head = ({"role": "system", "content": SYSTEM_PROMPT + "\nPrior session summary:\n" + summary},)
+    return head + tuple(history[-2 * WINDOW_TURNS:])
+
+
+def build_summary_messages(evicted, summary=""):
+    """Build the prompt folding the previous summary and evicted messages into a new summary."""
+    messages = [{"role": "system", "content": SUMMARY_INSTRUCTION}]
+    if summary:
+        messages.append({"role": "system", "content": "Earlier summary:\n" + summary})
+    return messages + evicted
+
+
+async def reply_and_summarize(messages, summary_messages):
+    """
+    Run the reply and the summary update concurrently. A failed summary is
+    returned as the exception instead of raised, so the reply is not lost.
+    """
+    reply, summary = await asyncio.gather(
+        llm.aask(messages), llm.aask(summary_messages), return_exceptions=True
+    )
+    if isinstance(reply, BaseException):
+        raise reply
+    return reply, summary
 
-llm = LLMClient()
 
 def chat():
     print("MedAssist AI Agent")
     print("-------------------")
 
-    history = []  # memory
+    history = []  # memory (recent turns only, older ones live in summary)
+    summary = ""
+    # One loop for the session: the async client's connections are bound to it
+    loop = asyncio.new_event_loop()
 
     while True:
         user = input("\nYou: ")
@@ -14,16 +70,35 @@ def chat():
             break
 
         history.append({"role": "user", "content": user})
+        messages = build_messages(history, summary)
 
-        messages = [
-            {"role": "system", "content": "You are a helpful AI assistant."}
-        ] + history
+        # The reply will push history to SUMMARIZE_AT: the messages to evict
+        # are already known, so summarize them alongside the reply
+        if len(history) + 1 >= SUMMARIZE_AT:
+            evicted = history[:len(history) + 1 - KEEP_MESSAGES]
+            reply, new_summary = loop.run_until_complete(
+                reply_and_summarize(messages, build_summary_messages(evicted, summary))
+            )
+            print("\nAI:", reply)
+            history.append({"role": "assistant", "content": reply})
+            # If the summary failed, keep the old one and evict nothing:
+            # the fold is retried on the next message
+            if not isinstance(new_summary, BaseException):
+                summary = new_summary
+                history = history[-KEEP_MESSAGES:]
+            continue
 
-        reply = llm.ask(messages)
+        print("\nAI: ", end="", flush=True)
+        reply = ""
+        for chunk in llm.ask_stream(messages):
+            print(chunk, end="", flush=True)
+            reply += chunk
+        print()
 
         history.append({"role": "assistant", "content": reply})
 
-        print("\nAI:", reply)
+    loop.run_until_complete(llm.aclose())
+    loop.close()
 
 if __name__ == "__main__":
     chat()
@@ -8,21 +8,15 @@ Priority order for configuration:
 3. .env file (for local development)
 """
 import os
+import sys
 from pathlib import Path
 
-# Cache for Streamlit availability check
-_streamlit_available = None
-
 def _is_streamlit_available():
-    """Check if Streamlit is available (lazy check)."""
-    global _streamlit_available
-    if _streamlit_available is None:
-        try:
-            import streamlit as st
-            _streamlit_available = True
-        except ImportError:
-            _streamlit_available = False
-    return _streamlit_available
+    """
+    Check if Streamlit is already loaded (i.e. we're running inside the app).
+    CLI scripts importing config never pay for importing streamlit.
+    """
+    return "streamlit" in sys.modules
 
 def _get_from_streamlit_secrets(key: str, default: str = "") -> str:
     """Get value from Streamlit secrets if available (lazy access)."""
@@ -61,22 +55,30 @@ if _env_path.exists():
         load_dotenv(_env_path)
     except ImportError:
         # Fallback to manual parsing if python-dotenv not available
-        with open(_env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith("#") and "=" in line:
-                    key, _, value = line.partition("=")
-                    os.environ.setdefault(key.strip(), value.strip().strip('"').strip("'"))
+        # Read once and skip keys already set before doing any value work
+        _env = os.environ
+        for line in _env_path.read_text().splitlines():
+            if not line or line[0] == "#" or "=" not in line:
+                continue
+            key, _, value = line.partition("=")
+            key = key.strip()
+            if not key or key[0] == "#" or key in _env:
+                continue
+            _env[key] = value.strip().strip('"').strip("'")
 
 # API Keys - Don't compute at import time, use function instead
 # This avoids issues with Streamlit secrets not being ready at import time
+_groq_api_key = None
+
 def get_groq_api_key():
     """Get GROQ_API_KEY - Streamlit secrets first, then environment variable."""
-    try:
-        import streamlit as st
-        return st.secrets["GROQ_API_KEY"]
-    except Exception:
-        return os.environ.get("GROQ_API_KEY", "")
+    global _groq_api_key
+    if _groq_api_key:
+        return _groq_api_key
+    key = _get_from_streamlit_secrets("GROQ_API_KEY") or os.environ.get("GROQ_API_KEY", "")
+    if key:
+        _groq_api_key = key
+    return key
 
 # Keep for backward compatibility, but prefer using get_groq_api_key()
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
@@ -92,3 +94,12 @@ POPPLER_PATH = (
     _get_from_streamlit_secrets("POPPLER_PATH") or 
     os.environ.get("POPPLER_PATH", r"C:\Users\amant\poppler-25.12.0\Library\bin")
 )
+
+# OCR render resolution for PDFs (200 DPI is plenty for typed reports)
+try:
+    OCR_DPI = int(
+        _get_from_streamlit_secrets("OCR_DPI") or
+        os.environ.get("OCR_DPI", "200")
+    )
+except (TypeError, ValueError):
+    OCR_DPI = 200
@@ -8,12 +8,32 @@ Usage:
     python convert_codes.py
 
 It will produce optimized dictionary JSONs in medical_codes/icd10.json and medical_codes/cpt4.json
+(plus .msgpack copies of each when msgpack is installed)
 """
 
 import json
 import re
 from pathlib import Path
 from html import unescape
+from collections.abc import Iterable
+
+# Optional: stream large list-rooted files instead of loading them whole
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Optional: C-accelerated JSON serialization
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional: binary copies of the maps, which workflow.py loads faster
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
 
 # ---- CONFIG: paths to your original files ----
 # If your original files have different names/locations, update these.
@@ -23,13 +43,18 @@ RAW_CPT_PATH = Path("CPT4.json")         # original raw file (from MediSuite)
 OUT_DIR = Path("medical_codes")
 OUT_DIR.mkdir(exist_ok=True)
 
+# Patterns used in the per-entry loops, compiled once
+_WS = re.compile(r"\s+")
+_CODE_RE = re.compile(r"^[A-Z0-9\.]+$", re.I)
+_CPT_RE = re.compile(r"^\d{3,6}[A-Z]?$")
+
 def normalize_text(s: str) -> str:
     if s is None:
         return ""
     # Unescape HTML entities, remove extra whitespace, normalize quotes
     s = unescape(str(s))
     s = s.replace("\u2019", "'").replace("\u201c", '"').replace("\u201d", '"')
-    s = re.sub(r"\s+", " ", s).strip()
+    s = _WS.sub(" ", s).strip()
     return s
 
 def try_load_json(path: Path):
@@ -40,77 +65,102 @@ def try_load_json(path: Path):
         print(f"Error parsing JSON {path}: {e}")
         raise
 
+def _first_char(path: Path) -> bytes:
+    """Return the first non-whitespace byte of a file (b'[' or b'{' for JSON)."""
+    with path.open("rb") as f:
+        while True:
+            chunk = f.read(4096)
+            if not chunk:
+                return b""
+            chunk = chunk.lstrip()
+            # Skip a UTF-8 BOM if present
+            if chunk.startswith(b"\xef\xbb\xbf"):
+                chunk = chunk[3:].lstrip()
+            if chunk:
+                return chunk[:1]
+
+def _iter_json_items(path: Path):
+    """Yield the elements of a list-rooted JSON file one at a time."""
+    with path.open("rb") as f:
+        try:
+            yield from ijson.items(f, "item")
+        except Exception as e:
+            print(f"Error parsing JSON {path}: {e}")
+            raise
+
+def load_raw(path: Path):
+    """
+    Load a raw code file for convert_icd/convert_cpt.
+    List-rooted files are streamed entry by entry when ijson is installed,
+    so the whole file is never held in memory. Dict-rooted files (or no
+    ijson) fall back to try_load_json.
+    """
+    if ijson is not None and _first_char(path) == b"[":
+        return _iter_json_items(path)
+    return try_load_json(path)
+
 def format_icd_code(code: str) -> str:
     """
     Format ICD-10 code with proper dot placement.
     E.g., 'A0100' -> 'A01.00', 'A001' -> 'A00.1', 'R509' -> 'R50.9'
     """
-    code = code.strip().upper()
-    # If already has a dot, return as-is
-    if '.' in code:
+    code = code.strip()
+    # Raw codes are almost always uppercase already
+    if not code.isupper():
+        code = code.upper()
+    # If already has a dot (or too short for one), return as-is
+    if '.' in code or len(code) <= 3:
         return code
     # ICD-10 codes have dot after 3rd character
-    if len(code) > 3:
-        return code[:3] + '.' + code[3:]
-    return code
+    return code[:3] + '.' + code[3:]
 
 
 def convert_icd(raw) -> dict:
     """
     Convert various raw shapes to { code: description } mapping.
     raw can be:
-      - list of dicts each with keys like "code", "disease", "category"
-      - list of dicts with different field names
+      - list (or iterator) of dicts each with keys like "code", "disease", "category"
+      - list (or iterator) of dicts with different field names
       - dict already mapping code->desc
     
     IMPORTANT: Prioritize 'disease' field over 'category' for full descriptions.
     """
-    out = {}
     if isinstance(raw, dict):
         # maybe already mapping
-        for k, v in raw.items():
-            formatted_code = format_icd_code(str(k))
-            out[formatted_code] = normalize_text(v)
-        return out
+        return {format_icd_code(str(k)): normalize_text(v) for k, v in raw.items()}
+
+    out = {}
 
-    if isinstance(raw, list):
+    if isinstance(raw, Iterable):
         for entry in raw:
             if not isinstance(entry, dict):
                 continue
             
-            code = None
-            desc = None
-            
-            # Extract code
-            for key in ("code", "Code", "CODE", "icd_code", "icd10"):
-                if key in entry and entry[key]:
-                    code = entry[key]
-                    break
+            # Extract code (first truthy alias wins)
+            get = entry.get
+            code = get("code") or get("Code") or get("CODE") or get("icd_code") or get("icd10")
             
             # PRIORITY ORDER for description: disease > description > desc > name > term
             # DO NOT use 'category' as primary - it's often just a partial label
-            for key in ("disease", "disease_name", "diseaseDescription", "description", "desc", "name", "term"):
-                if key in entry and entry[key]:
-                    desc = entry[key]
-                    break
+            desc = (
+                get("disease") or get("disease_name") or get("diseaseDescription")
+                or get("description") or get("desc") or get("name") or get("term")
+            )
             
             # If no description found, try category as last resort
-            if not desc and "category" in entry and entry["category"]:
-                desc = entry["category"]
+            if not desc:
+                desc = get("category")
             
             # Fallback: find code-like value
             if not code and len(entry) >= 1:
                 for v in entry.values():
-                    if isinstance(v, str) and re.match(r"^[A-Z0-9\.]+$", v.strip(), re.I):
+                    if isinstance(v, str) and _CODE_RE.match(v.strip()):
                         code = v
                         break
             
             # Fallback: find longest string as description
             if not desc:
-                strings = [str(v) for v in entry.values() if isinstance(v, str)]
-                strings = sorted(strings, key=lambda x: len(x), reverse=True)
-                if strings:
-                    desc = strings[0]
+                desc = max((v for v in entry.values() if isinstance(v, str)), key=len, default=None)
             
             if code:
                 formatted_code = format_icd_code(str(code))
@@ -128,38 +178,30 @@ def convert_cpt(raw) -> dict:
             out[str(k).strip().upper()] = normalize_text(v)
         return out
 
-    if isinstance(raw, list):
+    if isinstance(raw, Iterable):
         for entry in raw:
             if not isinstance(entry, dict):
                 continue
-            code = None
-            desc = None
-            for key in ("code", "procedure", "Procedure", "proc", "CPT4", "cpt"):
-                if key in entry and entry[key]:
-                    # heuristics: if the key looks like code or desc
-                    if key.lower() in ("code", "cpt", "cpt4"):
-                        code = entry[key]
-                    else:
-                        # sometimes procedure stored under 'procedure'
-                        desc = entry[key]
+            # heuristics: keys that look like a code or a description
+            # (the later alias in code > CPT4 > cpt wins, likewise for procedure > proc)
+            get = entry.get
+            code = get("cpt") or get("CPT4") or get("code")
+            # sometimes procedure stored under 'procedure'
+            desc = get("proc") or get("Procedure") or get("procedure")
             # fallback heuristics
             if not code:
                 # find value that matches typical CPT pattern (digits, maybe leading zeros)
                 for v in entry.values():
-                    if isinstance(v, str) and re.match(r"^\d{3,6}[A-Z]?$", v.strip()):
+                    if isinstance(v, str) and _CPT_RE.match(v.strip()):
                         code = v
                         break
             if not desc:
-                strings = [str(v) for v in entry.values() if isinstance(v, str)]
-                strings = sorted(strings, key=lambda x: len(x), reverse=True)
-                if strings:
-                    # prefer those strings that are not pure digits
-                    for s in strings:
-                        if not re.match(r"^\d+$", s.strip()):
-                            desc = s
-                            break
-                    if not desc:
-                        desc = strings[0]
+                strings = [v for v in entry.values() if isinstance(v, str)]
+                # prefer the longest string that is not pure digits
+                desc = (
+                    max((s for s in strings if not s.strip().isdigit()), key=len, default=None)
+                    or max(strings, key=len, default=None)
+                )
             if code:
                 code = str(code).strip().upper()
                 out[code] = normalize_text(desc) if desc else ""
@@ -167,12 +209,17 @@ def convert_cpt(raw) -> dict:
 
 def save_json(path: Path, data: dict):
     print(f"Saving {len(data):,} entries to {path}")
-    path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
+    else:
+        path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if msgpack is not None:
+        path.with_suffix(".msgpack").write_bytes(msgpack.packb(data, use_bin_type=True))
 
 def main():
     # ICD
     if RAW_ICD_PATH.exists():
-        raw = try_load_json(RAW_ICD_PATH)
+        raw = load_raw(RAW_ICD_PATH)
         icd_map = convert_icd(raw)
         save_json(OUT_DIR / "icd10.json", icd_map)
     else:
@@ -180,7 +227,7 @@ def main():
 
     # CPT
     if RAW_CPT_PATH.exists():
-        raw = try_load_json(RAW_CPT_PATH)
+        raw = load_raw(RAW_CPT_PATH)
         cpt_map = convert_cpt(raw)
         save_json(OUT_DIR / "cpt4.json", cpt_map)
     else:
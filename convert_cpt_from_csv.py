@@ -4,19 +4,13 @@ INPUT = "cpt4_source.csv"
 OUTPUT = "medical_codes/cpt4.json"
 
 def main():
-    cpt_map = {}
-
-    with open(INPUT, "r", encoding="utf-8") as f:
+    with open(INPUT, "r", encoding="utf-8", newline="") as f:
         reader = csv.reader(f)
-        for row in reader:
-            if len(row) < 2:
-                continue
-            code = row[0].strip().upper()
-            desc = row[1].strip()
-            cpt_map[code] = desc
+        cpt_map = {row[0].strip().upper(): row[1].strip() for row in reader if len(row) >= 2}
 
     with open(OUTPUT, "w", encoding="utf-8") as out:
-        json.dump(cpt_map, out, indent=2, ensure_ascii=False)
+        # Compact separators: no indent whitespace in the output file
+        json.dump(cpt_map, out, ensure_ascii=False, separators=(",", ":"))
 
     print("Saved:", OUTPUT)
     print("Total CPT codes:", len(cpt_map))
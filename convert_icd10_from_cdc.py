@@ -4,31 +4,24 @@ INPUT = "icd10_source.txt"
 OUTPUT = "medical_codes/icd10.json"
 
 
-def normalize(code):
+def normalize(code, _isalpha=str.isalpha):
     code = code.strip().upper()
-    if len(code) > 3 and code[0].isalpha():
+    if len(code) > 3 and _isalpha(code[0]):
         return code[0] + code[1:3] + "." + code[3:]
     return code
 
 
 def main():
-    icd_map = {}
-    
-    with open(INPUT, "r", encoding="utf-8") as f:
-        for line in f:
-            parts = line.strip().split(None, 4)
-            if len(parts) < 5:
-                continue
-
-            _, raw_code, level, short_desc, long_desc = parts[0], parts[1], parts[2], parts[3], parts[4]
-
-            # Keep *only level==1* which are real billable diagnosis codes
-            if level != "1":
-                continue
-
-            code = normalize(raw_code)
-            desc = long_desc.strip()
-            icd_map[code] = desc
+    # Lines are: order_no, code, level, short_desc, long_desc
+    # Stay in bytes until a line passes the filter so rejected lines cost
+    # nothing beyond the split. Keep *only level==1* which are real billable
+    # diagnosis codes
+    with open(INPUT, "rb") as f:
+        icd_map = {
+            normalize(parts[1].decode("utf-8")): parts[4].decode("utf-8").rstrip()
+            for parts in (line.split(None, 4) for line in f)
+            if len(parts) >= 5 and parts[2] == b"1"
+        }
 
     with open(OUTPUT, "w", encoding="utf-8") as out:
         json.dump(icd_map, out, ensure_ascii=False, indent=2)
@@ -5,16 +5,24 @@ Run once:
     python embedding_engine.py
 
 Outputs:
-    medical_codes/icd10_embeddings.npy
+    medical_codes/icd10_embeddings.npy (+ _int8.npy, _scales.npy)
     medical_codes/icd10_codes.json
-    medical_codes/cpt4_embeddings.npy
+    medical_codes/cpt4_embeddings.npy (+ _int8.npy, _scales.npy)
     medical_codes/cpt4_codes.json
+    medical_codes/icd10_hnsw.faiss, cpt4_hnsw.faiss (when faiss is installed)
 """
 from sentence_transformers import SentenceTransformer
 import numpy as np
+from semantic_search import quantize_int8, build_index, ICD_INDEX, CPT_INDEX
 import json
 from pathlib import Path
-from tqdm import tqdm
+from functools import lru_cache
+
+# Optional: C-accelerated JSON parsing
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Paths
 ICD_PATH = Path("medical_codes/icd10.json")
@@ -26,30 +34,66 @@ OUT_DIR.mkdir(exist_ok=True)
 # MODEL_NAME = "all-MiniLM-L6-v2"  
 MODEL_NAME = "emilyalsentzer/Bio_ClinicalBERT"
 BATCH_SIZE = 512  # safe on 8GB RAM
+MAX_SEQ_LENGTH = 512  # BERT position limit; code descriptions are far shorter
+
+def _device() -> str:
+    """Use the GPU when torch can see one."""
+    try:
+        import torch
+        return "cuda" if torch.cuda.is_available() else "cpu"
+    except ImportError:
+        return "cpu"
+
+@lru_cache(maxsize=1)
+def get_model():
+    """Load the embedding model once and reuse it for ICD and CPT."""
+    device = _device()
+    model = SentenceTransformer(MODEL_NAME, device=device)
+    model.max_seq_length = MAX_SEQ_LENGTH
+    if device == "cuda":
+        # fp16 roughly doubles throughput on GPU tensor cores
+        model.half()
+    return model
 
 def load_descriptions(path: Path):
-    data = json.loads(path.read_text(encoding="utf-8"))
+    if orjson is not None:
+        data = orjson.loads(path.read_bytes())
+    else:
+        data = json.loads(path.read_text(encoding="utf-8"))
     # data is a dict {code: description}
     codes = list(data.keys()) 
     descriptions = [f"{code} {data[code]}" if data[code] else f"{code}" for code in codes]
     return codes, descriptions
 
-def embed_and_save(codes, descriptions, out_npy: Path, out_codes: Path):
-    model = SentenceTransformer(MODEL_NAME)
-    embeddings = []
-    for i in tqdm(range(0, len(descriptions), BATCH_SIZE), desc="Embedding batches"):
-        batch = descriptions[i:i+BATCH_SIZE]
-        emb = model.encode(batch, show_progress_bar=False, convert_to_numpy=True)
-        embeddings.append(emb)
-    embeddings = np.vstack(embeddings)
-    # L2 normalize embeddings for cosine similarity via dot product
-    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-    norms[norms==0] = 1.0
-    embeddings = embeddings / norms
-    np.save(out_npy, embeddings)
-    out_codes.write_text(json.dumps(codes, ensure_ascii=False), encoding="utf-8")
+def embed_and_save(codes, descriptions, out_npy: Path, out_codes: Path, out_index: Path):
+    model = get_model()
+    # L2 normalized embeddings for cosine similarity via dot product
+    embeddings = model.encode(
+        descriptions,
+        batch_size=BATCH_SIZE,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=True,
+    )
+    # int8 + per-row scales: what semantic_search keeps in memory
+    q, scales = quantize_int8(embeddings)
+    np.save(out_npy.with_name(f"{out_npy.stem}_int8.npy"), q)
+    np.save(out_npy.with_name(f"{out_npy.stem}_scales.npy"), scales)
+    # fp16 halves disk and load size; accurate enough for cosine ranking
+    np.save(out_npy, embeddings.astype(np.float16))
+    if orjson is not None:
+        with out_codes.open("wb") as f:
+            f.write(orjson.dumps(codes))
+    else:
+        # Stream through a 1MB buffer instead of building the whole string
+        with out_codes.open("w", encoding="utf-8", buffering=1 << 20) as f:
+            json.dump(codes, f, ensure_ascii=False)
     print(f"Saved embeddings shape {embeddings.shape} to {out_npy}")
     print(f"Saved codes list to {out_codes}")
+    # Written last, so semantic_search sees it as newer than the embeddings
+    # and loads it instead of building one on the first query
+    if build_index(embeddings, out_index):
+        print(f"Saved HNSW index to {out_index}")
 
 def main():
     if not ICD_PATH.exists() or not CPT_PATH.exists():
@@ -58,10 +102,10 @@ def main():
     cpt_codes, cpt_desc = load_descriptions(CPT_PATH)
 
     print("Embedding ICD-10 descriptions...")
-    embed_and_save(icd_codes, icd_desc, OUT_DIR / "icd10_embeddings.npy", OUT_DIR / "icd10_codes.json")
+    embed_and_save(icd_codes, icd_desc, OUT_DIR / "icd10_embeddings.npy", OUT_DIR / "icd10_codes.json", ICD_INDEX)
 
     print("Embedding CPT-4 descriptions...")
-    embed_and_save(cpt_codes, cpt_desc, OUT_DIR / "cpt4_embeddings.npy", OUT_DIR / "cpt4_codes.json")
+    embed_and_save(cpt_codes, cpt_desc, OUT_DIR / "cpt4_embeddings.npy", OUT_DIR / "cpt4_codes.json", CPT_INDEX)
 
 if __name__ == "__main__":
     main()
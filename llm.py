@@ -1,38 +1,471 @@
+import asyncio
+import atexit
+import functools
+import hashlib
+import json
 import os
-from dotenv import load_dotenv
+import random
+import shelve
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
 
-load_dotenv()
+# Only load python-dotenv when there is a .env file to read, and only once
+# per process (re-imports and reloads skip it)
+_DOTENV_LOADED = False
 
-# Simple, guaranteed working approach for API key loading
-# IMPORTANT: Don't call this at import time - call it when actually needed
-def get_groq_key():
-    """Get GROQ API key - Streamlit secrets first, then environment variable."""
+
+def _load_dotenv_once():
+    global _DOTENV_LOADED
+    if _DOTENV_LOADED:
+        return
+    _DOTENV_LOADED = True
+    env_path = Path(".env")
+    if env_path.exists():
+        try:
+            from dotenv import load_dotenv
+            load_dotenv(env_path)
+        except ImportError:
+            pass
+
+
+_load_dotenv_once()
+
+
+@functools.lru_cache(maxsize=1)
+def _api_key():
+    """
+    Resolve the GROQ API key - Streamlit secrets first, then environment
+    variable. Raises KeyError when neither is set; exceptions aren't cached,
+    so a key configured later is still picked up.
+    """
     # Try Streamlit secrets first (for Streamlit Cloud)
     # This MUST be called at runtime, not import time
-    try:
-        import streamlit as st
-        # Direct access - this works on Streamlit Cloud at runtime
-        return st.secrets["GROQ_API_KEY"]
-    except (KeyError, AttributeError, Exception):
+    # Skipped when streamlit isn't loaded, so CLI use never imports it
+    key = ""
+    if "streamlit" in sys.modules:
+        try:
+            import streamlit as st
+            # Direct access - this works on Streamlit Cloud at runtime
+            key = st.secrets["GROQ_API_KEY"]
+        except (KeyError, AttributeError, Exception):
+            pass
+    if not key:
         # Fall back to environment variable (from .env file or system env)
-        return os.getenv("GROQ_API_KEY", "")
+        key = os.getenv("GROQ_API_KEY", "")
+    if not key:
+        raise KeyError("GROQ_API_KEY")
+    return key
 
-# Don't evaluate at import time - will be called when LLM client is used
-API_KEY = None
+
+# IMPORTANT: Don't call this at import time - call it when actually needed
+def get_groq_key():
+    """Get GROQ API key (cached after the first successful lookup), or ""."""
+    try:
+        return _api_key()
+    except KeyError:
+        return ""
 
 # Best Groq Model
 DEFAULT_MODEL = "llama-3.3-70b-versatile"
+TEMPERATURE = 0.2
+MAX_TOKENS = 800
+
+# Persistent reply cache, opt-in (e.g. LLM_CACHE_PATH=.llm_cache for
+# development): replies contain patient data and are stored unencrypted.
+# Without it, replies are only kept in memory
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+LLM_CACHE_TTL = 3600  # seconds
+LLM_CACHE_MAX_ENTRIES = 1000
+LLM_MEMORY_CACHE_MAX_ENTRIES = 256
+
+# Semantic reply cache (opt-in via LLMClient(semantic_cache=True)): reuses a
+# reply when a new single-turn prompt embeds close enough to a cached one
+SEMANTIC_CACHE_PATH = os.getenv("LLM_SEMANTIC_CACHE_PATH", ".llm_semantic_cache")
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 512
+
+
+# Retry backoff: min(cap, base * 2**attempt) plus up to `base` of jitter
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_CAP = 8.0
 
 
 class LLMError(Exception):
-    """Custom exception for LLM-related errors."""
-    pass
+    """
+    Custom exception for LLM-related errors.
+    `retry_after` is set (in seconds) on rate-limit errors when the API says
+    how long to wait, so callers can show a countdown.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ReplyCache:
+    """
+    On-disk (shelve) cache of LLM replies, keyed by a hash of the request.
+    Entries expire after `ttl` seconds and the oldest are evicted once
+    more than `max_entries` are stored. Any storage error disables the
+    cache rather than failing the request.
+    """
+
+    def __init__(self, path: str, ttl: float = LLM_CACHE_TTL, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._db = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._db is None and not self._disabled:
+            try:
+                self._db = shelve.open(self.path)
+                # Close before interpreter teardown: dbm.dumb (the only
+                # backend on Windows) errors if left to Shelf.__del__
+                atexit.register(self.close)
+            except Exception:
+                self._disabled = True
+                return None
+            try:
+                # Expired replies are otherwise only removed when read again
+                self._purge_expired(self._db, time.time())
+                self._db.sync()
+            except Exception:
+                pass
+        return self._db
+
+    def _purge_expired(self, db, now: float) -> dict:
+        """Delete expired entries; returns {key: stored_at} of the rest."""
+        ages = {}
+        for k in list(db.keys()):
+            stored_at = db[k][0]
+            if now - stored_at > self.ttl:
+                del db[k]
+            else:
+                ages[k] = stored_at
+        return ages
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                try:
+                    self._db.close()
+                except Exception:
+                    pass
+                self._db = None
+
+    def get(self, key: str):
+        with self._lock:
+            db = self._open()
+            if db is None:
+                return None
+            try:
+                entry = db.get(key)
+                if entry is None:
+                    return None
+                stored_at, value = entry
+                if time.time() - stored_at > self.ttl:
+                    del db[key]
+                    return None
+                return value
+            except Exception:
+                return None
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            db = self._open()
+            if db is None:
+                return
+            try:
+                now = time.time()
+                db[key] = (now, value)
+                if len(db) > self.max_entries:
+                    # Drop expired entries, then evict oldest down to 90% so
+                    # this doesn't run on every set
+                    ages = self._purge_expired(db, now)
+                    by_age = sorted(ages, key=ages.get)
+                    for k in by_age[:len(by_age) - int(self.max_entries * 0.9)]:
+                        del db[k]
+                db.sync()
+            except Exception:
+                pass
+
+
+class ResponseCache:
+    """
+    In-memory LRU of LLM replies in front of an optional persistent
+    ReplyCache. Shared by all LLMClient instances; tracks hits and misses.
+    """
+
+    def __init__(self, max_entries: int = LLM_MEMORY_CACHE_MAX_ENTRIES,
+                 ttl: float = LLM_CACHE_TTL, store: ReplyCache = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        value = self.store.get(key) if self.store is not None else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._remember(key, value)
+        if self.store is not None:
+            self.store.set(key, value)
+
+    def _remember(self, key: str, value: str):
+        self._entries[key] = (time.time(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    @property
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+_response_cache = ResponseCache(store=ReplyCache(LLM_CACHE_PATH) if LLM_CACHE_PATH else None)
+
+
+class SemanticCache:
+    """
+    Near-duplicate reply cache. Prompts are embedded with the Bio_ClinicalBERT
+    model already used by semantic_search; a cached reply is returned when
+    cosine similarity reaches `threshold` and the preceding (system) messages
+    are identical. Entries are evicted least-recently-used beyond
+    `max_entries` and persisted to `<path>.npy` + `<path>.json`.
+    """
+
+    def __init__(self, path: str = SEMANTIC_CACHE_PATH, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self._emb = None       # [N, D] normalized prompt embeddings
+        self._entries = []     # [context_key, reply, last_used] per row
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path:
+            return
+        try:
+            import numpy as np
+            emb = np.load(f"{self.path}.npy")
+            entries = json.loads(Path(f"{self.path}.json").read_text(encoding="utf-8"))
+            if len(entries) == emb.shape[0]:
+                self._emb, self._entries = emb, entries
+        except Exception:
+            pass
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            import numpy as np
+            np.save(f"{self.path}.npy", self._emb)
+            Path(f"{self.path}.json").write_text(json.dumps(self._entries, ensure_ascii=False), encoding="utf-8")
+        except Exception:
+            pass
+
+    @staticmethod
+    def _embed(text: str):
+        from semantic_search import embed_query
+        return embed_query(text)
+
+    def get(self, context_key: str, text: str):
+        with self._lock:
+            self._load()
+            if self._emb is None or not self._entries:
+                return None
+            qv = self._embed(text)
+            scores = self._emb.dot(qv)
+            best, best_score = None, self.threshold
+            for i, entry in enumerate(self._entries):
+                if entry[0] == context_key and scores[i] >= best_score:
+                    best, best_score = i, scores[i]
+            if best is None:
+                return None
+            self._entries[best][2] = time.time()
+            return self._entries[best][1]
+
+    def set(self, context_key: str, text: str, reply: str):
+        import numpy as np
+        with self._lock:
+            self._load()
+            qv = self._embed(text).astype(np.float32)[None, :]
+            self._emb = qv if self._emb is None else np.vstack([self._emb, qv])
+            self._entries.append([context_key, reply, time.time()])
+            if len(self._entries) > self.max_entries:
+                oldest = min(range(len(self._entries)), key=lambda i: self._entries[i][2])
+                self._emb = np.delete(self._emb, oldest, axis=0)
+                del self._entries[oldest]
+            self._save()
+
+
+_semantic_cache = None
+
+
+def _get_semantic_cache():
+    global _semantic_cache
+    if _semantic_cache is None:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
+
+
+def _is_single_turn(messages: list) -> bool:
+    """
+    Only standalone prompts (system messages + one user message) are eligible
+    for the semantic cache; multi-turn history could leak across users.
+    """
+    *context, last = messages
+    return last.get("role") == "user" and all(m.get("role") == "system" for m in context)
+
+# One pooled HTTP client shared by every LLMClient, so connections (and
+# their TLS sessions) are reused across requests and instances
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def _get_http_client():
+    """Create the shared httpx client on first use (HTTP/2 if h2 is installed)."""
+    global _http_client
+    with _http_client_lock:
+        if _http_client is None:
+            import httpx
+            limits = httpx.Limits(max_connections=100, max_keepalive_connections=50)
+            timeout = httpx.Timeout(60.0)
+            try:
+                _http_client = httpx.Client(http2=True, limits=limits, timeout=timeout)
+            except ImportError:
+                # h2 not installed - fall back to pooled HTTP/1.1
+                _http_client = httpx.Client(limits=limits, timeout=timeout)
+            atexit.register(_http_client.close)
+    return _http_client
+
+
+def _cache_key(model: str, messages: list) -> str:
+    """
+    Stable hash of everything that determines the reply. A 128-bit blake2b
+    digest: faster than sha256 and ample for a cache key.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "t": TEMPERATURE, "max_tokens": MAX_TOKENS},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _status_code(e: Exception):
+    """HTTP status code of an API error, if it has one."""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(getattr(e, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(e: Exception):
+    """Seconds from the Retry-After header of an API error, if present."""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return max(0.0, float(headers.get("retry-after")))
+    except (TypeError, ValueError):
+        return None
+
+
+def _backoff_delay(attempt: int, retry_after: float = None) -> float:
+    """Exponential backoff with jitter, honoring Retry-After when given."""
+    if retry_after is not None:
+        return min(RETRY_BACKOFF_CAP, retry_after)
+    delay = min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** attempt)
+    return delay + random.uniform(0, RETRY_BACKOFF_BASE)
+
+
+def _raise_if_fatal(e: Exception):
+    """Raise LLMError for errors that should not be retried."""
+    # Configuration errors (missing key, groq not installed)
+    if isinstance(e, LLMError):
+        raise e
+    
+    error_str = str(e).lower()
+    status = _status_code(e)
+    
+    # Don't retry on auth errors
+    if status in (401, 403) or "auth" in error_str or "api_key" in error_str or "unauthorized" in error_str:
+        raise LLMError(f"Authentication failed: {e}")
+    
+    # Don't retry on rate limits (let caller handle backoff)
+    if status == 429 or ("rate" in error_str and "limit" in error_str):
+        raise LLMError(f"Rate limit exceeded: {e}", retry_after=_retry_after(e))
+    
+    # Other 4xx errors won't succeed on retry; 5xx, timeouts and
+    # connection errors fall through and are retried
+    if status is not None and 400 <= status < 500:
+        raise LLMError(f"Request rejected: {e}")
 
 
 class LLMClient:
-    def __init__(self, model_name: str = DEFAULT_MODEL):
+    def __init__(self, model_name: str = DEFAULT_MODEL, cache_enabled: bool = True,
+                 semantic_cache: bool = False):
         self.model = model_name
         self._client = None
+        self._aclient = None
+        self._aclient_loop = None
+        self._cache = _response_cache if cache_enabled else None
+        self._semantic = _get_semantic_cache() if semantic_cache else None
+
+    def _semantic_get(self, messages: list):
+        """Look up a near-duplicate single-turn prompt; never raises."""
+        if self._semantic is None or not _is_single_turn(messages):
+            return None
+        try:
+            return self._semantic.get(_cache_key(self.model, messages[:-1]), messages[-1]["content"])
+        except Exception:
+            return None
+
+    def _semantic_set(self, messages: list, reply: str):
+        if self._semantic is None or not _is_single_turn(messages):
+            return
+        try:
+            self._semantic.set(_cache_key(self.model, messages[:-1]), messages[-1]["content"], reply)
+        except Exception:
+            pass
+
+    @property
+    def cache_stats(self) -> dict:
+        """Hit/miss counters of the reply cache (shared across clients)."""
+        if self._cache is None:
+            return {"hits": 0, "misses": 0, "size": 0}
+        return self._cache.stats
         
     @property
     def client(self):
@@ -46,11 +479,39 @@ class LLMClient:
                 )
             try:
                 from groq import Groq
-                self._client = Groq(api_key=api_key)
+                self._client = Groq(api_key=api_key, http_client=_get_http_client())
             except ImportError:
                 raise LLMError("groq package not installed. Run: pip install groq")
         return self._client
 
+    @property
+    def aclient(self):
+        """
+        Lazy initialization of async Groq client. Its connections belong to
+        the event loop that first used them, so a new client is created for
+        each loop (e.g. every asyncio.run() in main.py).
+        """
+        loop = asyncio.get_running_loop()
+        if self._aclient is None or self._aclient_loop is not loop:
+            api_key = get_groq_key()
+            if not api_key:
+                raise LLMError(
+                    "GROQ_API_KEY missing. Add it in Streamlit secrets or set as environment variable."
+                )
+            try:
+                from groq import AsyncGroq
+                self._aclient = AsyncGroq(api_key=api_key)
+                self._aclient_loop = loop
+            except ImportError:
+                raise LLMError("groq package not installed. Run: pip install groq")
+        return self._aclient
+
+    async def aclose(self):
+        """Close the async client; call before its event loop is closed."""
+        aclient, self._aclient, self._aclient_loop = self._aclient, None, None
+        if aclient is not None:
+            await aclient.close()
+
     def ask(self, messages: list, max_retries: int = 2) -> str:
         """
         Send messages to the LLM and get a response.
@@ -68,31 +529,138 @@ class LLMClient:
         if not messages:
             raise LLMError("No messages provided")
         
+        key = _cache_key(self.model, messages)
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        cached = self._semantic_get(messages)
+        if cached is not None:
+            return cached
+        
         last_error = None
         for attempt in range(max_retries + 1):
             try:
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=messages,
-                    temperature=0.2,
-                    max_tokens=800,
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS,
                 )
-                return response.choices[0].message.content
+                reply = response.choices[0].message.content
+                if reply:
+                    if self._cache is not None:
+                        self._cache.set(key, reply)
+                    self._semantic_set(messages, reply)
+                return reply
                 
             except Exception as e:
                 last_error = e
-                error_str = str(e).lower()
+                _raise_if_fatal(e)
                 
-                # Don't retry on auth errors
-                if "auth" in error_str or "api_key" in error_str or "unauthorized" in error_str:
-                    raise LLMError(f"Authentication failed: {e}")
+                # Retry on transient errors, backing off between attempts
+                if attempt < max_retries:
+                    time.sleep(_backoff_delay(attempt, _retry_after(e)))
+                    
+        raise LLMError(f"LLM request failed after {max_retries + 1} attempts: {last_error}")
+
+    async def aask(self, messages: list, max_retries: int = 2) -> str:
+        """
+        Async variant of ask(), for running independent requests concurrently
+        (e.g. with asyncio.gather).
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content' keys
+            max_retries: Number of retry attempts on transient errors
+            
+        Returns:
+            The assistant's response text
+            
+        Raises:
+            LLMError: On configuration or API errors
+        """
+        if not messages:
+            raise LLMError("No messages provided")
+        
+        key = _cache_key(self.model, messages)
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                return cached
+        
+        last_error = None
+        for attempt in range(max_retries + 1):
+            try:
+                response = await self.aclient.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    temperature=TEMPERATURE,
+                    max_tokens=MAX_TOKENS,
+                )
+                reply = response.choices[0].message.content
+                if self._cache is not None and reply:
+                    self._cache.set(key, reply)
+                return reply
                 
-                # Don't retry on rate limits (let caller handle backoff)
-                if "rate" in error_str and "limit" in error_str:
-                    raise LLMError(f"Rate limit exceeded: {e}")
+            except Exception as e:
+                last_error = e
+                _raise_if_fatal(e)
                 
-                # Retry on transient errors
+                # Retry on transient errors, backing off between attempts
                 if attempt < max_retries:
-                    continue
+                    await asyncio.sleep(_backoff_delay(attempt, _retry_after(e)))
                     
         raise LLMError(f"LLM request failed after {max_retries + 1} attempts: {last_error}")
+
+    def ask_stream(self, messages: list):
+        """
+        Send messages to the LLM and yield the response as it is generated.
+        
+        Args:
+            messages: List of message dicts with 'role' and 'content' keys
+            
+        Yields:
+            Chunks of the assistant's response text
+            
+        Raises:
+            LLMError: On configuration or API errors
+        """
+        if not messages:
+            raise LLMError("No messages provided")
+        
+        key = _cache_key(self.model, messages)
+        if self._cache is not None:
+            cached = self._cache.get(key)
+            if cached is not None:
+                yield cached
+                return
+        
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=TEMPERATURE,
+                max_tokens=MAX_TOKENS,
+                stream=True,
+            )
+            parts = []
+            for chunk in response:
+                text = chunk.choices[0].delta.content or ""
+                parts.append(text)
+                yield text
+            reply = "".join(parts)
+            if self._cache is not None and reply:
+                self._cache.set(key, reply)
+        except LLMError:
+            raise
+        except Exception as e:
+            raise LLMError(f"LLM streaming request failed: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def get_llm_client() -> LLMClient:
+    """
+    The process-wide LLMClient. Every caller shares one instance, and with
+    it the pooled HTTP connections; the API key is only read on first request.
+    """
+    return LLMClient()
@@ -1,22 +1,75 @@
-from ocr import pdf_to_text
-from llm import LLMClient, LLMError
+import asyncio
+
+from ocr import pdf_to_text_stream
+from llm import get_llm_client, LLMError
+
+# Pages summarized per LLM call; each call starts as soon as its pages are OCRed
+PAGES_PER_CHUNK = 4
+
+SYSTEM = {"role": "system", "content": "You are a clinical summarizer."}
+
+
+def summary_messages(text):
+    return [
+        SYSTEM,
+        {"role": "user", "content": f"Extract medical information and summarize:\n\n{text}"}
+    ]
+
+
+async def summarize_document(path):
+    """
+    OCR the PDF and summarize it, overlapping the two: every PAGES_PER_CHUNK
+    pages are sent to the LLM while OCR continues on the rest. Partial
+    summaries of a multi-chunk document are then merged into one.
+    Returns None if OCR found no text.
+    """
+    llm = get_llm_client()
+    try:
+        return await _summarize(llm, path)
+    finally:
+        # The client's connections are bound to this loop, which asyncio.run closes
+        await llm.aclose()
+
+
+async def _summarize(llm, path):
+    pages = pdf_to_text_stream(path)
+    tasks = []
+    chunk = []
+
+    while True:
+        # OCR blocks, so wait for the next page off the event loop
+        page = await asyncio.to_thread(next, pages, None)
+        if page is not None:
+            chunk.append(page)
+        if chunk and (page is None or len(chunk) == PAGES_PER_CHUNK):
+            tasks.append(asyncio.create_task(llm.aask(summary_messages("\n\n".join(chunk)))))
+            chunk = []
+        if page is None:
+            break
+
+    if not tasks:
+        return None
+
+    summaries = await asyncio.gather(*tasks)
+    if len(summaries) == 1:
+        return summaries[0]
+
+    parts = "\n\n".join(f"Part {i}:\n{s}" for i, s in enumerate(summaries, 1))
+    return await llm.aask([
+        SYSTEM,
+        {"role": "user", "content": f"Combine these summaries of consecutive parts of one document into a single summary:\n\n{parts}"}
+    ])
 
-llm = LLMClient()
 
 def analyze_document(path):
     try:
-        text = pdf_to_text(path)
-        
-        if not text or text.startswith("Error"):
-            print(f"OCR Error: {text}")
-            return
+        summary = asyncio.run(summarize_document(path))
 
-        messages = [
-            {"role": "system", "content": "You are a clinical summarizer."},
-            {"role": "user", "content": f"Extract medical information and summarize:\n\n{text}"}
-        ]
+        if summary is None:
+            print("OCR Error: no text extracted")
+            return
 
-        print(llm.ask(messages))
+        print(summary)
     except LLMError as e:
         print(f"LLM Error: {e}")
     except Exception as e:
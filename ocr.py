@@ -5,18 +5,50 @@ Requires:
 - Tesseract OCR installed and accessible
 - Poppler (for PDF processing)
 """
-from pdf2image import convert_from_path
+from pdf2image import convert_from_bytes
 from PIL import Image
 import pytesseract
 import subprocess
 import os
-from config import TESSERACT_PATH, POPPLER_PATH
+import hashlib
+import atexit
+import functools
+import multiprocessing
+import tempfile
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import TESSERACT_PATH, POPPLER_PATH, OCR_DPI
 from pathlib import Path
+from typing import Iterator
+
+# Optional: binarize pages with OpenCV (SIMD) before Tesseract
+try:
+    import cv2
+    import numpy as np
+except ImportError:
+    cv2 = None
+
+# --psm 6: treat each page as one uniform block of text, skipping layout
+# analysis (the typed reports and claims this app reads are single-column)
+TESSERACT_CONFIG = "--psm 6 -l eng"
 
 # Configure Tesseract path
 # Set the path early so pytesseract can use it
 pytesseract.pytesseract.tesseract_cmd = TESSERACT_PATH
 
+# OCR results cache, keyed by BLAKE2b of the PDF bytes + DPI
+OCR_CACHE_DIR = Path(os.environ.get("OCR_CACHE_DIR", ".ocr_cache"))
+OCR_CACHE_MAX_FILES = 256  # oldest (by last use) evicted beyond this
+_MEMORY_CACHE_SIZE = 32
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()  # shared by all Streamlit sessions
+
+# Set once _check_tesseract has succeeded; it then only re-applies the path
+_TESSERACT_OK = False
+_tesseract_resolved_path = None
+
 
 class OCRError(Exception):
     """Raised when OCR operations fail."""
@@ -38,7 +70,11 @@ def _is_streamlit_cloud():
     return False
 
 def _check_tesseract():
-    """Verify Tesseract is available."""
+    """Verify Tesseract is available (the full check runs once per process)."""
+    global _TESSERACT_OK, _tesseract_resolved_path
+    if _TESSERACT_OK:
+        pytesseract.pytesseract.tesseract_cmd = _tesseract_resolved_path
+        return
     
     # Check if we're on Streamlit Cloud (where OCR isn't available)
     if _is_streamlit_cloud():
@@ -115,6 +151,62 @@ def _check_tesseract():
     except Exception:
         # If subprocess fails, continue anyway - file exists
         pass
+    
+    _tesseract_resolved_path = pytesseract.pytesseract.tesseract_cmd
+    _TESSERACT_OK = True
+
+
+def _preprocess(image: Image.Image):
+    """
+    Prepare an image for Tesseract: grayscale, then (with OpenCV) adaptive
+    Gaussian thresholding so Tesseract gets an already-binarized page.
+    """
+    # Tesseract binarizes internally; RGB would just be wasted bytes
+    if image.mode != "L":
+        image = image.convert("L")
+    if cv2 is None:
+        return image
+    return cv2.adaptiveThreshold(
+        np.asarray(image), 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10
+    )
+
+
+_ocr_pool = None
+_ocr_pool_lock = threading.Lock()
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    """
+    The page-OCR worker pool, created on first use and shared by all calls:
+    spawned workers take a while to start, so they are kept between documents.
+    Spawn, not fork: OCR runs on background threads (Streamlit, asyncio) and
+    forking a process that has other threads can deadlock the child.
+    """
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is None:
+            _ocr_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(_ocr_pool.shutdown, cancel_futures=True)
+        return _ocr_pool
+
+
+def _discard_ocr_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool (a worker died) so the next call starts a new one."""
+    global _ocr_pool
+    with _ocr_pool_lock:
+        if _ocr_pool is pool:
+            _ocr_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _ocr_page(page_path: str, tesseract_cmd: str) -> str:
+    """OCR a single rendered page image (runs in a worker process)."""
+    pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    with Image.open(page_path) as page:
+        return pytesseract.image_to_string(_preprocess(page), config=TESSERACT_CONFIG)
 
 
 def image_to_text(image: Image.Image) -> str:
@@ -132,18 +224,104 @@ def image_to_text(image: Image.Image) -> str:
     """
     _check_tesseract()
     try:
-        text = pytesseract.image_to_string(image)
+        text = pytesseract.image_to_string(_preprocess(image), config=TESSERACT_CONFIG)
         return text.strip() if text else ""
     except Exception as e:
         raise OCRError(f"Failed to extract text from image: {e}")
 
 
-def pdf_to_text(pdf_path: str, dpi: int = 300) -> str:
+def _cache_get(key: str):
+    """Look up OCR text in memory, then on disk."""
+    with _memory_cache_lock:
+        if key in _memory_cache:
+            _memory_cache.move_to_end(key)
+            return _memory_cache[key]
+    path = OCR_CACHE_DIR / f"{key}.txt"
+    try:
+        text = path.read_text(encoding="utf-8")
+        os.utime(path)  # mark as recently used for eviction
+    except OSError:
+        return None
+    _cache_put_memory(key, text)
+    return text
+
+
+def _cache_put_memory(key: str, text: str):
+    with _memory_cache_lock:
+        _memory_cache[key] = text
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > _MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def _cache_put(key: str, text: str):
+    """Store OCR text in memory and atomically on disk, evicting old files."""
+    _cache_put_memory(key, text)
+    try:
+        OCR_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=OCR_CACHE_DIR, suffix=".tmp", delete=False
+        ) as tmp:
+            tmp.write(text)
+        os.replace(tmp.name, OCR_CACHE_DIR / f"{key}.txt")
+        
+        files = list(OCR_CACHE_DIR.glob("*.txt"))
+        if len(files) > OCR_CACHE_MAX_FILES:
+            files.sort(key=lambda f: f.stat().st_mtime)
+            for f in files[:len(files) - OCR_CACHE_MAX_FILES]:
+                f.unlink(missing_ok=True)
+    except OSError:
+        # Caching is best-effort; never fail OCR because of it
+        pass
+
+
+def _pdf_bytes(pdf) -> bytes:
+    """The PDF's content, given a path, raw bytes or a binary file object."""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return bytes(pdf)
+    if hasattr(pdf, "read"):
+        return pdf.read()
+    try:
+        return Path(pdf).read_bytes()
+    except FileNotFoundError:
+        raise OCRError(f"PDF file not found: {pdf}")
+    except OSError as e:
+        raise OCRError(f"Failed to read PDF {pdf}: {e}")
+
+
+def _cached_by_content(func):
+    """
+    Cache a page-text generator's output by PDF content, so re-uploads skip
+    OCR. A hit yields the whole cached text as a single chunk. The wrapped
+    function receives the PDF bytes, read once here.
+    """
+    @functools.wraps(func)
+    def wrapper(pdf, dpi: int = OCR_DPI) -> Iterator[str]:
+        data = _pdf_bytes(pdf)
+        key = f"{hashlib.blake2b(data, digest_size=32).hexdigest()}_{dpi}"
+        
+        text = _cache_get(key)
+        if text is not None:
+            if text:
+                yield text
+            return
+        
+        pages = []
+        for page in func(data, dpi):
+            pages.append(page)
+            yield page
+        # Don't cache partial failures
+        if not any(p.startswith("[Error on page ") for p in pages):
+            _cache_put(key, "\n\n".join(pages))
+    return wrapper
+
+
+def pdf_to_text(pdf_path: str, dpi: int = OCR_DPI) -> str:
     """
     Extract text from a PDF file using OCR.
     
     Args:
-        pdf_path: Path to the PDF file
+        pdf_path: Path to the PDF file (or its bytes, or a binary file object)
         dpi: Resolution for PDF to image conversion (higher = better quality but slower)
         
     Returns:
@@ -152,11 +330,32 @@ def pdf_to_text(pdf_path: str, dpi: int = 300) -> str:
     Raises:
         OCRError: If PDF conversion or OCR fails
     """
-    _check_tesseract()
+    return "\n\n".join(pdf_to_text_stream(pdf_path, dpi))
+
+
+@_cached_by_content
+def pdf_to_text_stream(pdf_path: str, dpi: int = OCR_DPI) -> Iterator[str]:
+    """
+    Extract text from a PDF file page by page, as OCR finishes.
     
-    pdf_file = Path(pdf_path)
-    if not pdf_file.exists():
-        raise OCRError(f"PDF file not found: {pdf_path}")
+    Pages are OCRed in parallel; each page's text is yielded (in page order)
+    as soon as it and all earlier pages are done, so callers can start
+    working on the first pages while later ones are still being read.
+    Pages with no text are skipped. Results are cached by PDF content;
+    a cached document comes back as one chunk.
+    
+    Args:
+        pdf_path: Path to the PDF file (or its bytes, or a binary file object)
+        dpi: Resolution for PDF to image conversion
+        
+    Yields:
+        Text of each page, or an "[Error on page N: ...]" marker
+        
+    Raises:
+        OCRError: If the PDF can't be read or converted
+    """
+    # The cache wrapper has already read the PDF: pdf_path is its bytes here
+    _check_tesseract()
     
     # Check Poppler
     import os
@@ -170,21 +369,43 @@ def pdf_to_text(pdf_path: str, dpi: int = 300) -> str:
             "Download from: https://github.com/oschwartz10612/poppler-windows/releases"
         )
     
-    try:
-        pages = convert_from_path(pdf_path, dpi, poppler_path=POPPLER_PATH)
-    except Exception as e:
-        raise OCRError(f"Failed to convert PDF to images: {e}")
-    
-    if not pages:
-        return ""
-    
-    full_text = []
-    for i, page in enumerate(pages):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        # Render pages to files so workers receive a path, not a pickled image.
+        # Grayscale JPEG at q=85 keeps the temp files small without hurting OCR
         try:
-            page_text = pytesseract.image_to_string(page)
-            if page_text:
-                full_text.append(page_text.strip())
+            pages = convert_from_bytes(
+                pdf_path, dpi, poppler_path=POPPLER_PATH,
+                output_folder=tmpdir, fmt="jpeg", jpegopt={"quality": 85},
+                paths_only=True, grayscale=True
+            )
         except Exception as e:
-            full_text.append(f"[Error on page {i+1}: {e}]")
-    
-    return "\n\n".join(full_text)
+            raise OCRError(f"Failed to convert PDF to images: {e}")
+        
+        if not pages:
+            return
+        
+        # Tesseract is CPU-bound per page: OCR pages in parallel, one per worker
+        tesseract_cmd = pytesseract.pytesseract.tesseract_cmd
+        pool = _get_ocr_pool()
+        futures = [pool.submit(_ocr_page, page, tesseract_cmd) for page in pages]
+        try:
+            # Waiting on futures in submission order keeps pages in order while
+            # later pages keep running in the background
+            for i, future in enumerate(futures):
+                try:
+                    page_text = future.result()
+                    if page_text:
+                        yield page_text.strip()
+                except BrokenProcessPool as e:
+                    _discard_ocr_pool(pool)
+                    yield f"[Error on page {i+1}: {e}]"
+                except Exception as e:
+                    yield f"[Error on page {i+1}: {e}]"
+                finally:
+                    # Free each page's disk space as soon as it's been read
+                    Path(pages[i]).unlink(missing_ok=True)
+        finally:
+            # The pool outlives this call: if the caller stops early, don't
+            # leave its remaining pages queued
+            for future in futures:
+                future.cancel()
@@ -13,6 +13,30 @@ class PDFError(Exception):
     pass
 
 
+LINE_HEIGHT = 18
+BOTTOM_MARGIN = 100
+
+
+def _draw_lines(c: canvas.Canvas, lines: List[str], y: float, height: float) -> float:
+    """
+    Draw lines at x=60 through a single text object, starting a new page
+    when the bottom margin is reached. Returns the y below the last line.
+    """
+    txt = c.beginText(60, y)
+    txt.setFont("Helvetica", 11)
+    txt.setLeading(LINE_HEIGHT)
+    for line in lines:
+        if txt.getY() < BOTTOM_MARGIN:  # Start new page if needed
+            c.drawText(txt)
+            c.showPage()
+            txt = c.beginText(60, height - 50)
+            txt.setFont("Helvetica", 11)
+            txt.setLeading(LINE_HEIGHT)
+        txt.textLine(line)
+    c.drawText(txt)
+    return txt.getY()
+
+
 def build_claim_pdf(
     output_path: str,
     patient: Dict[str, str],
@@ -53,52 +77,29 @@ def build_claim_pdf(
         y = height - 100
         c.setFont("Helvetica-Bold", 12)
         c.drawString(50, y, "Patient Information")
-        c.setFont("Helvetica", 11)
         y -= 25
-        c.drawString(60, y, f"Name: {patient.get('name', 'N/A')}")
-        y -= 18
-        c.drawString(60, y, f"DOB: {patient.get('dob', 'N/A')}")
-        y -= 18
-        c.drawString(60, y, f"Insurance: {patient.get('insurance', 'N/A')}")
-        y -= 18
-        c.drawString(60, y, f"Policy #: {patient.get('policy', 'N/A')}")
+        y = _draw_lines(c, [
+            f"Name: {patient.get('name', 'N/A')}",
+            f"DOB: {patient.get('dob', 'N/A')}",
+            f"Insurance: {patient.get('insurance', 'N/A')}",
+            f"Policy #: {patient.get('policy', 'N/A')}",
+        ], y, height)
         
         # Diagnoses section
-        y -= 35
+        y -= 35 - LINE_HEIGHT
         c.setFont("Helvetica-Bold", 12)
         c.drawString(50, y, f"Diagnoses (ICD-10) - {len(diagnoses)} code(s)")
-        c.setFont("Helvetica", 11)
         y -= 20
         
-        for d in diagnoses:
-            if y < 100:  # Start new page if needed
-                c.showPage()
-                y = height - 50
-                c.setFont("Helvetica", 11)
-            c.drawString(60, y, f"• {d}")
-            y -= 18
-        
-        if not diagnoses:
-            c.drawString(60, y, "No diagnoses specified")
-            y -= 18
+        y = _draw_lines(c, [f"• {d}" for d in diagnoses] or ["No diagnoses specified"], y, height)
         
         # Procedures section
         y -= 25
         c.setFont("Helvetica-Bold", 12)
         c.drawString(50, y, f"Procedures (CPT-4) - {len(procedures)} code(s)")
-        c.setFont("Helvetica", 11)
         y -= 20
         
-        for p in procedures:
-            if y < 100:  # Start new page if needed
-                c.showPage()
-                y = height - 50
-                c.setFont("Helvetica", 11)
-            c.drawString(60, y, f"• {p}")
-            y -= 18
-        
-        if not procedures:
-            c.drawString(60, y, "No procedures specified")
+        _draw_lines(c, [f"• {p}" for p in procedures] or ["No procedures specified"], y, height)
         
         c.showPage()
         c.save()
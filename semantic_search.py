@@ -7,24 +7,58 @@ using cosine similarity with normalized embeddings.
 """
 import numpy as np
 import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
 from pathlib import Path
 from typing import List, Tuple, Optional
 
 OUT_DIR = Path("medical_codes")
 ICD_EMB = OUT_DIR / "icd10_embeddings.npy"
+ICD_EMB_INT8 = OUT_DIR / "icd10_embeddings_int8.npy"
+ICD_EMB_SCALES = OUT_DIR / "icd10_embeddings_scales.npy"
 ICD_CODES = OUT_DIR / "icd10_codes.json"
 CPT_EMB = OUT_DIR / "cpt4_embeddings.npy"
+CPT_EMB_INT8 = OUT_DIR / "cpt4_embeddings_int8.npy"
+CPT_EMB_SCALES = OUT_DIR / "cpt4_embeddings_scales.npy"
 CPT_CODES = OUT_DIR / "cpt4_codes.json"
 
+# Optional FAISS HNSW indexes (used when faiss is installed)
+ICD_INDEX = OUT_DIR / "icd10_hnsw.faiss"
+CPT_INDEX = OUT_DIR / "cpt4_hnsw.faiss"
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
 # Lazy-loaded globals
 _model = None
+_model_lock = threading.Lock()
 _icd_emb: Optional[np.ndarray] = None
 _icd_codes: Optional[List[str]] = None
 _cpt_emb: Optional[np.ndarray] = None
 _cpt_codes: Optional[List[str]] = None
+_icd_index = None  # None = not tried yet, False = unavailable (or still building)
+_cpt_index = None
+_icd_index_lock = threading.Lock()
+_cpt_index_lock = threading.Lock()
+_index_builds = set()  # index paths with a background build running
+
+# Recent query embeddings, so ICD and CPT searches (and reruns) for the
+# same text share one forward pass
+QUERY_CACHE_SIZE = 1024
+_query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_query_cache_lock = threading.Lock()
+
+# Cache misses arriving within QUERY_BATCH_WINDOW seconds of each other (e.g.
+# the parallel ICD and CPT searches) are encoded in one forward pass; a batch
+# is flushed early once QUERY_BATCH_SIZE texts are waiting
+QUERY_BATCH_WINDOW = 0.02
+QUERY_BATCH_SIZE = 8
 
 # Clinical BERT model - good for medical terminology
 MODEL_NAME = "emilyalsentzer/Bio_ClinicalBERT"
+# ONNX export of the model, used for CPU inference when onnxruntime is installed
+ONNX_MODEL_DIR = OUT_DIR / "bio_clinicalbert_onnx"
 
 
 class EmbeddingError(Exception):
@@ -32,28 +66,201 @@ class EmbeddingError(Exception):
     pass
 
 
+def _cuda_available() -> bool:
+    try:
+        import torch
+    except ImportError:
+        return False
+    return torch.cuda.is_available()
+
+
+def _optimize_model(model):
+    """
+    On CUDA, run the model in fp16 and compile its transformer with
+    torch.compile (PyTorch >= 2.1). Best effort: on CPU, or if compiling
+    fails, the model is returned unchanged.
+    """
+    if not _cuda_available():
+        return model
+    import torch
+    model.half()
+    version = tuple(int(p) for p in torch.__version__.split("+")[0].split(".")[:2])
+    if version >= (2, 1):
+        try:
+            # Compile the inner HF module: encode() still goes through the
+            # SentenceTransformer wrapper, which calls this forward
+            transformer = model[0]
+            transformer.auto_model = torch.compile(transformer.auto_model, mode="reduce-overhead")
+        except Exception:
+            pass
+    return model
+
+
+def _load_onnx_model():
+    """
+    Load the model on ONNX Runtime's CPU provider (sentence-transformers >= 3.2
+    with optimum[onnxruntime]). The first load exports MODEL_NAME to
+    ONNX_MODEL_DIR; later loads reuse that export. Returns None if the ONNX
+    backend is unavailable, so the caller falls back to PyTorch.
+    """
+    try:
+        import onnxruntime  # noqa: F401
+        from sentence_transformers import SentenceTransformer
+    except ImportError:
+        return None
+    kwargs = {"backend": "onnx", "model_kwargs": {"provider": "CPUExecutionProvider"}}
+    try:
+        if ONNX_MODEL_DIR.exists():
+            return SentenceTransformer(str(ONNX_MODEL_DIR), **kwargs)
+        model = SentenceTransformer(MODEL_NAME, **kwargs)
+    except Exception:
+        return None
+    try:
+        model.save(str(ONNX_MODEL_DIR))
+    except OSError:
+        pass  # read-only checkout: export again next time
+    return model
+
+
 def _ensure_model():
     """Load the sentence transformer model (lazy initialization)."""
     global _model
     if _model is None:
-        try:
-            from sentence_transformers import SentenceTransformer
-            _model = SentenceTransformer(MODEL_NAME)
-        except ImportError:
-            raise EmbeddingError(
-                "sentence-transformers not installed. "
-                "Run: pip install sentence-transformers"
-            )
-        except Exception as e:
-            raise EmbeddingError(f"Failed to load model '{MODEL_NAME}': {e}")
+        # ICD and CPT searches may run in parallel threads: load only once
+        with _model_lock:
+            if _model is None:
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    model = None if _cuda_available() else _load_onnx_model()
+                    if model is None:
+                        model = _optimize_model(SentenceTransformer(MODEL_NAME))
+                    _model = model
+                except ImportError:
+                    raise EmbeddingError(
+                        "sentence-transformers not installed. "
+                        "Run: pip install sentence-transformers"
+                    )
+                except Exception as e:
+                    raise EmbeddingError(f"Failed to load model '{MODEL_NAME}': {e}")
     return _model
 
 
+def _prepare_embeddings(emb: np.ndarray) -> np.ndarray:
+    """
+    Return embeddings as a contiguous float32 matrix with unit-length rows.
+    Done once at load so every query's emb.dot(qv) is a plain BLAS SGEMV and
+    scores are true cosine similarities even if the file wasn't normalized.
+    A memory-mapped file that already satisfies this is returned as is, so
+    it stays shared through the OS page cache instead of copied into RAM.
+    """
+    if emb.dtype in (np.float32, np.float16) and emb.flags.c_contiguous:
+        sq_norms = np.einsum("ij,ij->i", emb, emb, dtype=np.float32)
+        if np.allclose(sq_norms, 1.0, atol=1e-2 if emb.dtype == np.float16 else 1e-3):
+            # fp16 (what embedding_engine writes) stays mapped at half size
+            return emb if emb.dtype == np.float32 else HalfEmbeddings(emb)
+    emb = np.array(emb, dtype=np.float32, order="C")
+    norms = np.linalg.norm(emb, axis=1, keepdims=True)
+    np.divide(emb, norms, out=emb, where=norms > 0)
+    return emb
+
+
+def quantize_int8(emb: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantize embeddings per row to int8 with a float32 scale per row,
+    so that emb ~= q * scales[:, None].
+    """
+    emb = np.asarray(emb, dtype=np.float32)
+    scales = np.abs(emb).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    q = np.clip(np.round(emb / scales[:, None]), -127, 127).astype(np.int8)
+    return q, scales.astype(np.float32)
+
+
+class QuantizedEmbeddings:
+    """
+    int8 embedding matrix with per-row scales: a quarter of the float32
+    memory and bandwidth. dot() dequantizes a block of rows at a time into
+    float32 (small enough to stay in cache) and runs BLAS on it, since
+    NumPy has no int8 BLAS path.
+    """
+    BLOCK_ROWS = 4096
+
+    def __init__(self, q: np.ndarray, scales: np.ndarray):
+        self.q = q
+        self.scales = np.asarray(scales, dtype=np.float32).ravel()
+
+    @property
+    def shape(self):
+        return self.q.shape
+
+    def dot(self, qv: np.ndarray) -> np.ndarray:
+        """Scores for a query vector (n,) or a matrix of query columns (n, B)."""
+        n, d = self.q.shape
+        qv = np.asarray(qv, dtype=np.float32)
+        out = np.empty((n,) + qv.shape[1:], dtype=np.float32)
+        # One float32 scratch block, reused: no per-block allocation
+        buf = np.empty((min(self.BLOCK_ROWS, n), d), dtype=np.float32)
+        for start in range(0, n, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, n)
+            block = buf[:end - start]
+            np.copyto(block, self.q[start:end], casting="unsafe")
+            np.dot(block, qv, out=out[start:end])
+        # Per-row scales applied once to the scores, not to every element
+        out *= self.scales.reshape((n,) + (1,) * (qv.ndim - 1))
+        return out
+
+    def dense(self) -> np.ndarray:
+        """The dequantized float32 matrix."""
+        return self.q.astype(np.float32) * self.scales[:, None]
+
+
+class HalfEmbeddings:
+    """
+    Normalized fp16 embedding matrix, typically memory-mapped: half the
+    float32 bandwidth. Like QuantizedEmbeddings, dot() widens a block of
+    rows at a time to float32 for BLAS, since NumPy has no fp16 BLAS path.
+    """
+    BLOCK_ROWS = 4096
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    def dot(self, qv: np.ndarray) -> np.ndarray:
+        """Scores for a query vector (n,) or a matrix of query columns (n, B)."""
+        n = self.matrix.shape[0]
+        out = np.empty((n,) + qv.shape[1:], dtype=np.float32)
+        for start in range(0, n, self.BLOCK_ROWS):
+            end = min(start + self.BLOCK_ROWS, n)
+            out[start:end] = self.matrix[start:end].astype(np.float32).dot(qv)
+        return out
+
+    def dense(self) -> np.ndarray:
+        """The float32 matrix."""
+        return self.matrix.astype(np.float32)
+
+
+def _load_embeddings(emb_path: Path, int8_path: Path, scales_path: Path):
+    """
+    Load the int8 embeddings if they were generated, else the float ones.
+    Files are memory-mapped read-only: searches only read them, and the
+    pages are shared between processes (e.g. Streamlit workers).
+    """
+    if int8_path.exists() and scales_path.exists():
+        return QuantizedEmbeddings(
+            np.load(int8_path, mmap_mode="r"), np.load(scales_path, mmap_mode="r")
+        )
+    return _prepare_embeddings(np.load(emb_path, mmap_mode="r"))
+
+
 def _load_icd() -> Tuple[np.ndarray, List[str]]:
     """Load ICD-10 embeddings and codes."""
     global _icd_emb, _icd_codes
     if _icd_emb is None:
-        if not ICD_EMB.exists():
+        if not ICD_EMB.exists() and not ICD_EMB_INT8.exists():
             raise EmbeddingError(
                 f"ICD embeddings not found at {ICD_EMB}. "
                 "Run: python embedding_engine.py"
@@ -64,7 +271,7 @@ def _load_icd() -> Tuple[np.ndarray, List[str]]:
                 "Run: python embedding_engine.py"
             )
         try:
-            _icd_emb = np.load(ICD_EMB)
+            _icd_emb = _load_embeddings(ICD_EMB, ICD_EMB_INT8, ICD_EMB_SCALES)
             _icd_codes = json.loads(ICD_CODES.read_text(encoding="utf-8"))
         except Exception as e:
             raise EmbeddingError(f"Failed to load ICD data: {e}")
@@ -81,7 +288,7 @@ def _load_cpt() -> Tuple[np.ndarray, List[str]]:
     """Load CPT-4 embeddings and codes."""
     global _cpt_emb, _cpt_codes
     if _cpt_emb is None:
-        if not CPT_EMB.exists():
+        if not CPT_EMB.exists() and not CPT_EMB_INT8.exists():
             raise EmbeddingError(
                 f"CPT embeddings not found at {CPT_EMB}. "
                 "Run: python embedding_engine.py"
@@ -92,7 +299,7 @@ def _load_cpt() -> Tuple[np.ndarray, List[str]]:
                 "Run: python embedding_engine.py"
             )
         try:
-            _cpt_emb = np.load(CPT_EMB)
+            _cpt_emb = _load_embeddings(CPT_EMB, CPT_EMB_INT8, CPT_EMB_SCALES)
             _cpt_codes = json.loads(CPT_CODES.read_text(encoding="utf-8"))
         except Exception as e:
             raise EmbeddingError(f"Failed to load CPT data: {e}")
@@ -105,9 +312,270 @@ def _load_cpt() -> Tuple[np.ndarray, List[str]]:
     return _cpt_emb, _cpt_codes
 
 
-def _embed_query(text: str) -> np.ndarray:
+def _hnsw_index(faiss, vectors: np.ndarray):
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    # Inner product on normalized vectors == cosine similarity
+    index = faiss.IndexHNSWFlat(vectors.shape[1], HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    index.add(vectors)
+    return index
+
+
+def build_index(vectors: np.ndarray, index_path: Path) -> bool:
+    """
+    Build an HNSW index over normalized embedding rows and write it to
+    index_path (embedding_engine.py does this after computing embeddings).
+    Returns False if faiss isn't installed.
+    """
+    try:
+        import faiss
+    except ImportError:
+        return False
+    faiss.write_index(_hnsw_index(faiss, vectors), str(index_path))
+    return True
+
+
+def _read_index_mmap(faiss, index_path: Path):
+    """
+    Read a persisted index memory-mapped and read-only. IO_FLAG_MMAP_IFC
+    (faiss >= 1.9) maps the HNSW vector storage; older releases only know
+    IO_FLAG_MMAP, and anything they can't map is read into memory.
+    """
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(str(index_path), mmap_flag | faiss.IO_FLAG_READ_ONLY)
+    except Exception:
+        return faiss.read_index(str(index_path))
+
+
+def _load_index(emb, index_path: Path):
+    """
+    Load the persisted HNSW index if it matches the embeddings (same row
+    count and dimension). Returns None if there is none, it is stale, or
+    faiss isn't installed.
+    """
+    try:
+        import faiss
+    except ImportError:
+        return None
+    if not index_path.exists():
+        return None
+    try:
+        index = _read_index_mmap(faiss, index_path)
+    except Exception:
+        return None
+    if index.ntotal != emb.shape[0] or index.d != emb.shape[1]:
+        return None
+    index.hnsw.efSearch = HNSW_EF_SEARCH
+    return index
+
+
+def _build_index_in_background(emb, index_path: Path, on_done):
     """
-    Embed a query text and return normalized vector.
+    Build (and persist) an HNSW index on a daemon thread - minutes for the
+    ICD corpus - and hand it to on_done. Searches use brute force meanwhile.
+    Nothing happens if faiss isn't installed.
+    """
+    try:
+        import faiss
+    except ImportError:
+        return
+    if index_path in _index_builds:
+        return  # e.g. after clear_cache(): the running build will finish
+    _index_builds.add(index_path)
+    
+    def work():
+        try:
+            if isinstance(emb, (QuantizedEmbeddings, HalfEmbeddings)):
+                vectors = emb.dense()
+            else:
+                vectors = np.ascontiguousarray(emb, dtype=np.float32)
+            index = _hnsw_index(faiss, vectors)
+            del vectors
+            try:
+                faiss.write_index(index, str(index_path))
+                # Serve from the mapped file rather than the in-memory build
+                index = _read_index_mmap(faiss, index_path)
+            except Exception:
+                pass  # read-only checkout: keep the in-memory build
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            on_done(index)
+        except Exception:
+            pass  # stay on brute force
+        finally:
+            _index_builds.discard(index_path)
+    
+    threading.Thread(target=work, name=f"build-{index_path.stem}", daemon=True).start()
+
+
+def _set_icd_index(index):
+    global _icd_index
+    _icd_index = index
+
+
+def _set_cpt_index(index):
+    global _cpt_index
+    _cpt_index = index
+
+
+def _icd_ann_index(emb):
+    global _icd_index
+    if _icd_index is None:
+        with _icd_index_lock:
+            if _icd_index is None:
+                _icd_index = _load_index(emb, ICD_INDEX) or False
+                if _icd_index is False:
+                    # Never build on the request path (embedding_engine.py
+                    # normally prebuilds it)
+                    _build_index_in_background(emb, ICD_INDEX, _set_icd_index)
+    return _icd_index or None
+
+
+def _cpt_ann_index(emb):
+    global _cpt_index
+    if _cpt_index is None:
+        with _cpt_index_lock:
+            if _cpt_index is None:
+                _cpt_index = _load_index(emb, CPT_INDEX) or False
+                if _cpt_index is False:
+                    _build_index_in_background(emb, CPT_INDEX, _set_cpt_index)
+    return _cpt_index or None
+
+
+def _search_index(index, codes: List[str], qv: np.ndarray, k: int) -> List[Tuple[str, float]]:
+    """Top-k (code, score) from an HNSW index, best first."""
+    scores, idx = index.search(qv.reshape(1, -1).astype(np.float32), k)
+    return [(codes[i], float(sc)) for i, sc in zip(idx[0], scores[0]) if i >= 0]
+
+
+def _search_index_batch(index, codes: List[str], qm: np.ndarray, k: int) -> List[List[Tuple[str, float]]]:
+    """Top-k (code, score) per query row of qm from an HNSW index."""
+    scores, idx = index.search(np.ascontiguousarray(qm, dtype=np.float32), k)
+    return [
+        [(codes[i], float(sc)) for i, sc in zip(row_idx, row_scores) if i >= 0]
+        for row_idx, row_scores in zip(idx, scores)
+    ]
+
+
+def _top_k_columns(scores: np.ndarray, codes: List[str], top_k: int) -> List[List[Tuple[str, float]]]:
+    """Top-k (code, score) for each column of an [N, B] score matrix."""
+    k = min(top_k, scores.shape[0])
+    if k <= 0:
+        return [[] for _ in range(scores.shape[1])]
+    idx = np.argpartition(-scores, k - 1, axis=0)[:k]
+    top = np.take_along_axis(scores, idx, axis=0)
+    order = np.argsort(-top, axis=0)
+    idx = np.take_along_axis(idx, order, axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    return [
+        [(codes[i], float(sc)) for i, sc in zip(idx[:, j], top[:, j])]
+        for j in range(scores.shape[1])
+    ]
+
+
+def _encode(texts: List[str]) -> np.ndarray:
+    """Run the model over texts in one batch; returns normalized float32 rows."""
+    model = _ensure_model()
+    try:
+        import torch
+        no_grad = torch.inference_mode()
+    except ImportError:
+        import contextlib
+        no_grad = contextlib.nullcontext()
+    with no_grad:
+        vecs = model.encode(
+            list(texts), convert_to_numpy=True, batch_size=32, show_progress_bar=False
+        )
+    vecs = np.asarray(vecs, dtype=np.float32)
+    norms = np.linalg.norm(vecs, axis=1, keepdims=True)
+    np.divide(vecs, norms, out=vecs, where=norms > 0)
+    return vecs
+
+
+class QueryEmbedBatcher:
+    """
+    Coalesce concurrent query embeddings into shared forward passes.
+    
+    submit() returns a Future for the text's normalized vector. A background
+    thread collects texts for up to `window` seconds (or until `max_batch`
+    are waiting) and encodes them together; a text already in flight gets
+    the pending Future instead of a second encode.
+    """
+    
+    def __init__(self, window: float = QUERY_BATCH_WINDOW, max_batch: int = QUERY_BATCH_SIZE):
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: "OrderedDict[str, Future]" = OrderedDict()
+        self._queued: List[str] = []
+        self._cond = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+    
+    def submit(self, text: str) -> Future:
+        with self._cond:
+            fut = self._pending.get(text)
+            if fut is None:
+                fut = self._pending[text] = Future()
+                self._queued.append(text)
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="query-embed", daemon=True)
+                    self._worker.start()
+                self._cond.notify()
+            return fut
+    
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queued)
+                self._cond.wait_for(lambda: len(self._queued) >= self.max_batch, timeout=self.window)
+                # Take everything waiting: max_batch only triggers an early flush
+                batch, self._queued = self._queued, []
+            try:
+                vecs = _encode(batch)
+                vecs.setflags(write=False)  # rows are shared through the cache
+                error = None
+            except Exception as e:
+                error = e
+            with self._cond:
+                futures = [self._pending.pop(t) for t in batch]
+            for i, fut in enumerate(futures):
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(vecs[i])
+
+
+_batcher = QueryEmbedBatcher()
+
+
+def _embed_queries(texts: List[str]) -> np.ndarray:
+    """
+    Embed several query texts; returns normalized rows in input order.
+    Cached texts are reused, the rest go through the shared batcher.
+    """
+    if any(not t or not t.strip() for t in texts):
+        raise EmbeddingError("Cannot embed empty query")
+    
+    with _query_cache_lock:
+        found = {t: _query_cache[t] for t in texts if t in _query_cache}
+        for t in found:
+            _query_cache.move_to_end(t)
+    
+    misses = [t for t in dict.fromkeys(texts) if t not in found]
+    if misses:
+        futures = [_batcher.submit(t) for t in misses]
+        vecs = [f.result() for f in futures]
+        with _query_cache_lock:
+            for t, vec in zip(misses, vecs):
+                found[t] = _query_cache[t] = vec
+            while len(_query_cache) > QUERY_CACHE_SIZE:
+                _query_cache.popitem(last=False)
+    
+    return np.stack([found[t] for t in texts])
+
+
+def embed_query(text: str) -> np.ndarray:
+    """
+    Embed a query text and return normalized vector (cached per text).
     
     Args:
         text: The query string to embed
@@ -115,15 +583,7 @@ def _embed_query(text: str) -> np.ndarray:
     Returns:
         Normalized embedding vector
     """
-    if not text or not text.strip():
-        raise EmbeddingError("Cannot embed empty query")
-    
-    model = _ensure_model()
-    vec = model.encode([text], convert_to_numpy=True)[0]
-    norm = np.linalg.norm(vec)
-    if norm == 0:
-        return vec
-    return vec / norm
+    return _embed_queries([text])[0]
 
 
 def semantic_search_icd(query: str, top_k: int = 10) -> List[Tuple[str, float]]:
@@ -138,7 +598,13 @@ def semantic_search_icd(query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         List of (code, similarity_score) tuples, sorted by score descending
     """
     emb, codes = _load_icd()
-    qv = _embed_query(query)
+    qv = embed_query(query)
+    
+    if top_k <= 0:
+        return []
+    index = _icd_ann_index(emb)
+    if index is not None:
+        return _search_index(index, codes, qv, min(top_k, len(codes)))
     
     # Cosine similarity via dot product (embeddings are pre-normalized)
     scores = emb.dot(qv)
@@ -148,8 +614,8 @@ def semantic_search_icd(query: str, top_k: int = 10) -> List[Tuple[str, float]]:
     if k <= 0:
         return []
     
-    # Use argpartition for efficiency on large arrays
-    idx = np.argpartition(-scores, range(k))[:k]
+    # Partition at k-1 (O(N)), then sort only the k-slice
+    idx = np.argpartition(-scores, k - 1)[:k]
     idx_sorted = idx[np.argsort(-scores[idx])]
     
     results = [(codes[i], float(scores[i])) for i in idx_sorted]
@@ -168,7 +634,13 @@ def semantic_search_cpt(query: str, top_k: int = 10) -> List[Tuple[str, float]]:
         List of (code, similarity_score) tuples, sorted by score descending
     """
     emb, codes = _load_cpt()
-    qv = _embed_query(query)
+    qv = embed_query(query)
+    
+    if top_k <= 0:
+        return []
+    index = _cpt_ann_index(emb)
+    if index is not None:
+        return _search_index(index, codes, qv, min(top_k, len(codes)))
     
     scores = emb.dot(qv)
     
@@ -176,18 +648,75 @@ def semantic_search_cpt(query: str, top_k: int = 10) -> List[Tuple[str, float]]:
     if k <= 0:
         return []
     
-    idx = np.argpartition(-scores, range(k))[:k]
+    idx = np.argpartition(-scores, k - 1)[:k]
     idx_sorted = idx[np.argsort(-scores[idx])]
     
     results = [(codes[i], float(scores[i])) for i in idx_sorted]
     return results
 
 
+def semantic_search_icd_batch(queries: List[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+    """
+    Search ICD-10 codes for several queries at once.
+    
+    All queries are embedded in one batch and scored with a single
+    matrix-matrix product instead of one matrix-vector product per query.
+    
+    Args:
+        queries: Clinical descriptions to search for
+        top_k: Number of results to return per query
+        
+    Returns:
+        One list of (code, similarity_score) tuples per query, in query order
+    """
+    if not queries:
+        return []
+    emb, codes = _load_icd()
+    qm = _embed_queries(queries)
+    
+    if top_k <= 0:
+        return [[] for _ in queries]
+    index = _icd_ann_index(emb)
+    if index is not None:
+        return _search_index_batch(index, codes, qm, min(top_k, len(codes)))
+    
+    return _top_k_columns(emb.dot(qm.T), codes, top_k)
+
+
+def semantic_search_cpt_batch(queries: List[str], top_k: int = 10) -> List[List[Tuple[str, float]]]:
+    """
+    Search CPT-4 codes for several queries at once.
+    
+    Args:
+        queries: Procedure descriptions to search for
+        top_k: Number of results to return per query
+        
+    Returns:
+        One list of (code, similarity_score) tuples per query, in query order
+    """
+    if not queries:
+        return []
+    emb, codes = _load_cpt()
+    qm = _embed_queries(queries)
+    
+    if top_k <= 0:
+        return [[] for _ in queries]
+    index = _cpt_ann_index(emb)
+    if index is not None:
+        return _search_index_batch(index, codes, qm, min(top_k, len(codes)))
+    
+    return _top_k_columns(emb.dot(qm.T), codes, top_k)
+
+
 def clear_cache():
     """Clear cached embeddings and model (useful for testing or memory management)."""
-    global _model, _icd_emb, _icd_codes, _cpt_emb, _cpt_codes
+    global _model, _icd_emb, _icd_codes, _cpt_emb, _cpt_codes, _icd_index, _cpt_index
     _model = None
     _icd_emb = None
     _icd_codes = None
     _cpt_emb = None
     _cpt_codes = None
+    _icd_index = None
+    _cpt_index = None
+    with _query_cache_lock:
+        _query_cache.clear()
@@ -16,29 +16,95 @@ with st.sidebar.expander("🔧 Debug Secrets", expanded=False):
         st.write(f"Error checking secrets: {e}")
 
 # Now safe to import other modules
-from llm import LLMClient, LLMError
-from ocr import pdf_to_text, image_to_text, OCRError
-from workflow import suggest_icd10, suggest_cpt
+from llm import LLMError, get_llm_client as _shared_llm_client
+from ocr import pdf_to_text_stream, image_to_text, OCRError
+from workflow import suggest_icd10_batch, suggest_cpt_batch, both_suggest
 from pdf_builder import build_claim_pdf, PDFError
+from config import OCR_DPI
 from PIL import Image
 import tempfile
 import os
+import io
+import queue
+import threading
 import datetime
 
 # Initialize LLM client with error handling
 @st.cache_resource
 def get_llm_client():
-    """Get cached LLM client instance."""
+    """Get the shared LLM client instance."""
     try:
-        return LLMClient()
+        return _shared_llm_client()
     except LLMError as e:
         st.error(f"LLM initialization failed: {e}")
         return None
 
 llm = get_llm_client()
 
+
+# The Upload & OCR page summarizes this much of the OCR text
+SUMMARY_INPUT_CHARS = 4000
+
+_OCR_DONE = object()
+
+
+def ocr_pdf_in_background(pdf_bytes: bytes, dpi: int = OCR_DPI):
+    """
+    OCR a PDF in a background thread and yield its page texts as they are
+    ready, so the caller can act on early pages while later ones are still
+    being read. Repeat uploads are served from the OCR content cache.
+    """
+    pages = queue.Queue()
+
+    def work():
+        try:
+            for page in pdf_to_text_stream(pdf_bytes, dpi=dpi):
+                pages.put(page)
+        except Exception as e:
+            pages.put(e)
+        finally:
+            pages.put(_OCR_DONE)
+
+    threading.Thread(target=work, daemon=True).start()
+    while True:
+        item = pages.get()
+        if item is _OCR_DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+# Streamlit reruns the whole script on every widget interaction: cache the
+# expensive calls so only new inputs pay for OCR or code search (PDF OCR is
+# cached by content inside ocr.py)
+@st.cache_data(show_spinner=False, max_entries=16)
+def cached_image_to_text(image_bytes: bytes) -> str:
+    """OCR an image, keyed by its bytes."""
+    return image_to_text(Image.open(io.BytesIO(image_bytes)))
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_suggest_icd10(queries: tuple, limit: int, method: str):
+    return suggest_icd10_batch(list(queries), limit=limit, method=method)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_suggest_cpt(queries: tuple, limit: int, method: str):
+    return suggest_cpt_batch(list(queries), limit=limit, method=method)
+
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def cached_suggest_both(queries: tuple, limit: int, method: str):
+    return both_suggest(list(queries), limit=limit, method=method)
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
+if "summary" not in st.session_state:
+    # Running summary of the messages before summarized_upto; only the
+    # messages after it are sent to the LLM verbatim
+    st.session_state.summary = ""
+    st.session_state.summarized_upto = 0
 
 st.title("MedAssist AI – Medical Coding Assistant")
 st.markdown("AI-powered medical document processing, coding, and claim generation.")
@@ -64,6 +130,18 @@ if page == "Chat":
         "Clinical Summarizer": "You summarize clinical documents, extract diagnoses, procedures, and clinical intent."
     }
 
+    # At most MAX_HISTORY_TURNS recent turns (user + assistant) are sent
+    # verbatim; beyond that, the oldest are folded into the running summary
+    # until KEEP_TURNS remain. Folding in steps keeps the system prefix stable
+    # for several turns and costs one summary call per step, not per turn
+    MAX_HISTORY_TURNS = 8
+    KEEP_TURNS = 4
+
+    SUMMARY_INSTRUCTION = (
+        "Summarize the prior conversation in one paragraph, "
+        "preserving names, instructions, facts."
+    )
+
     GLOBAL_BEHAVIOR = """
     Always follow the selected assistant role.
     Use the chat history to answer follow-up questions naturally.
@@ -72,135 +150,101 @@ if page == "Chat":
 
     system_prompt = SYSTEM_PROMPTS[mode]
 
-    if st.button("New Chat 🧹"):
-        st.session_state.messages = []
-        st.rerun()
-
-    theme = st.get_option("theme.base")
-    is_dark = theme == "dark"
-
-    USER_BG = "#A3BE8C" if is_dark else "#DFF0FF"
-    AI_BG = "#4C566A" if is_dark else "#F0F0F0"
-    TEXT_COLOR = "#ECEFF4" if is_dark else "#000000"
-
-    # Space for sticky footer
-    st.markdown("<div style='height:70px;'></div>", unsafe_allow_html=True)
-
-
-    # --------------------- DISPLAY CHAT HISTORY ---------------------
-    for msg in st.session_state.messages:
-        is_user = msg["role"] == "user"
-        align = "flex-end" if is_user else "flex-start"
-        bubble_color = USER_BG if is_user else AI_BG
-
-        st.markdown(
-            f"""
-            <div style="display:flex; justify-content:{align}; margin:8px 0; width:100%;">
-                <div style="
-                    max-width:65%;
-                    display: inline-block;
-                    background-color:{bubble_color};
-                    padding:14px 18px;
-                    border-radius:14px;
-                    color:{TEXT_COLOR};
-                    font-size:15.5px;
-                    line-height:1.45;
-                    word-wrap:break-word;
-                    overflow-wrap:break-word;
-                ">
-                    <b>{'You' if is_user else 'AI'}:</b><br>{msg['text']}
-                    <div style="font-size:10.5px; opacity:0.65; margin-top:6px; text-align:right;">
-                        {msg['time']}
-                    </div>
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
-
-    st.markdown("---")
-
-
-    # --------------------- STICKY INPUT BAR ---------------------
-    st.markdown(
-        """
-        <style>
-        .sticky-input {
-            position: fixed;
-            bottom: 0;
-            left: 0;
-            right: 0;
-            padding: 14px 22px;
-            background: rgba(250,250,250,1);
-            border-top: 1px solid #ccc;
-            z-index: 9999;
-        }
-        .sticky-input-dark {
-            background: rgba(20,20,20,1);
-            border-top: 1px solid #444;
-        }
-        .main-container { padding-bottom: 120px !important; }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-    st.markdown("<script>document.body.classList.add('main-container')</script>",
-                unsafe_allow_html=True)
-
-    input_class = "sticky-input-dark" if is_dark else "sticky-input"
-    st.markdown(f"<div class='{input_class}'>", unsafe_allow_html=True)
-
-    with st.form("chat_form", clear_on_submit=True):
-        user_input = st.text_input(
-            "",
-            placeholder="Ask something, for example: What is pneumonia?"
-        )
-        submitted = st.form_submit_button("Send")
-
-    st.markdown("</div>", unsafe_allow_html=True)
-
-
-    # --------------------- PROCESS USER MESSAGE ---------------------
-    if submitted and user_input.strip():
+    # Only this fragment reruns on chat input, not the sidebar or the rest of
+    # the page; system_prompt keeps its value from the last full run
+    @st.fragment
+    def chat_fragment(system_prompt):
+        # No rerun needed: the history below is drawn after the reset
+        if st.button("New Chat 🧹"):
+            st.session_state.messages = []
+            st.session_state.summary = ""
+            st.session_state.summarized_upto = 0
+
+        # --------------------- DISPLAY CHAT HISTORY ---------------------
+        # Inside a fragment the input is inline, not pinned: keep every
+        # message, including the new turn below, above it
+        history_box = st.container()
+        for msg in st.session_state.messages:
+            with history_box.chat_message(msg["role"]):
+                st.markdown(msg["text"])
+                st.caption(msg["time"])
 
-        # Save user's message
-        st.session_state.messages.append({
-            "role": "user",
-            "text": user_input,
-            "time": datetime.datetime.now().strftime("%H:%M")
-        })
+        user_input = st.chat_input("Ask something, for example: What is pneumonia?")
 
-        # Build full conversation for LLM
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "system", "content": GLOBAL_BEHAVIOR}
-        ]
 
-        # Add history
-        for msg in st.session_state.messages:
-            messages.append({
-                "role": msg["role"],
-                "content": msg["text"]
-            })
+        # --------------------- PROCESS USER MESSAGE ---------------------
+        if user_input and user_input.strip():
 
-        # Call LLM with error handling
-        with st.spinner("Thinking..."):
-            if llm is None:
-                reply = "LLM is not configured. Please set GROQ_API_KEY in your environment or .env file."
-            else:
+            # Save user's message
+            user_msg = {
+                "role": "user",
+                "text": user_input,
+                "time": datetime.datetime.now().strftime("%H:%M")
+            }
+            st.session_state.messages.append(user_msg)
+
+            # Fold the oldest turns into the summary once the window is full
+            history = st.session_state.messages
+            start = st.session_state.summarized_upto
+            if llm is not None and len(history) - start > 2 * MAX_HISTORY_TURNS:
+                # Keep KEEP_TURNS full turns plus the new user message
+                end = len(history) - 2 * KEEP_TURNS - 1
+                summary_messages = [{"role": "system", "content": SUMMARY_INSTRUCTION}]
+                if st.session_state.summary:
+                    summary_messages.append({"role": "system", "content": "Earlier summary:\n" + st.session_state.summary})
+                summary_messages += [{"role": m["role"], "content": m["text"]} for m in history[start:end]]
                 try:
-                    reply = llm.ask(messages)
-                except LLMError as e:
-                    reply = f"Sorry, I encountered an error: {e}"
-
-        # Save assistant reply
-        st.session_state.messages.append({
-            "role": "assistant",
-            "text": reply,
-            "time": datetime.datetime.now().strftime("%H:%M")
-        })
+                    with st.spinner("Summarizing earlier conversation..."):
+                        st.session_state.summary = llm.ask(summary_messages)
+                    st.session_state.summarized_upto = start = end
+                except LLMError:
+                    # Keep sending those turns verbatim; retry on the next message
+                    pass
+
+            # Build conversation for LLM: system prompts, summary, recent turns
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "system", "content": GLOBAL_BEHAVIOR}
+            ]
+            if st.session_state.summary:
+                messages.append({
+                    "role": "system",
+                    "content": "Previous conversation summary: " + st.session_state.summary
+                })
+
+            # Add history
+            for msg in history[start:]:
+                messages.append({
+                    "role": msg["role"],
+                    "content": msg["text"]
+                })
+
+            with history_box.chat_message("user"):
+                st.markdown(user_msg["text"])
+                st.caption(user_msg["time"])
+
+            # Stream the reply into the assistant message as tokens arrive
+            reply_time = datetime.datetime.now().strftime("%H:%M")
+            with history_box.chat_message("assistant"):
+                if llm is None:
+                    reply = "LLM is not configured. Please set GROQ_API_KEY in your environment or .env file."
+                    st.markdown(reply)
+                else:
+                    try:
+                        reply = st.write_stream(llm.ask_stream(messages))
+                    except LLMError as e:
+                        reply = f"Sorry, I encountered an error: {e}"
+                        st.markdown(reply)
+                st.caption(reply_time)
+
+            # Save assistant reply; no rerun, so the streamed render stays in place
+            st.session_state.messages.append({
+                "role": "assistant",
+                "text": reply,
+                "time": reply_time
+            })
 
-        st.rerun()
+    chat_fragment(system_prompt)
 
 
 
@@ -231,50 +275,73 @@ elif page == "Upload & OCR":
         st.stop()
     
     if uploaded and not is_streamlit_cloud:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(uploaded.name)[1]) as tmp:
-            tmp.write(uploaded.read())
-            tmp_path = tmp.name
-
-        with st.spinner("Running OCR..."):
-            try:
-                if uploaded.type == "application/pdf":
-                    text = pdf_to_text(tmp_path)
+        try:
+            st.subheader("Extracted Text")
+            ocr_box = st.empty()
+            st.subheader("AI Summary")
+            summary_box = st.empty()
+
+            status = st.status("Running OCR...", expanded=False)
+            if uploaded.type == "application/pdf":
+                pages = ocr_pdf_in_background(uploaded.getvalue())
+            else:
+                pages = iter([cached_image_to_text(uploaded.getvalue())])
+
+            parts = []
+
+            def read_pages(min_chars=None):
+                """Pull OCRed pages into parts until min_chars are available (or all)."""
+                for page in pages:
+                    parts.append(page)
+                    status.update(label=f"Running OCR... {len(parts)} page(s) read")
+                    ocr_box.text("\n\n".join(parts))
+                    if min_chars and sum(len(p) + 2 for p in parts) >= min_chars:
+                        return
+
+            # Start the summary as soon as its input is ready; OCR of the
+            # remaining pages continues in the background meanwhile
+            read_pages(SUMMARY_INPUT_CHARS)
+            text = "\n\n".join(parts)
+            if text:
+                if llm is None:
+                    summary_box.warning("LLM not configured. Set GROQ_API_KEY to enable AI summaries.")
                 else:
-                    img = Image.open(tmp_path)
-                    text = image_to_text(img)
+                    try:
+                        buf = []
+                        for token in llm.ask_stream([
+                            {"role": "system", "content": "You are a clinical summarizer. Extract key diagnoses, procedures, and clinical findings."},
+                            {"role": "user", "content": f"Summarize and extract diagnoses from this OCR text:\n{text[:SUMMARY_INPUT_CHARS]}"},
+                        ]):
+                            buf.append(token)
+                            summary_box.markdown("".join(buf))
+                    except LLMError as e:
+                        summary_box.error(f"Failed to generate summary: {e}")
+
+            read_pages()
+            status.update(label=f"OCR complete: {len(parts)} page(s)", state="complete")
+            text = "\n\n".join(parts)
+            if text:
+                ocr_box.text_area("OCR Output", text, height=250)
+            else:
+                ocr_box.warning("No text could be extracted from the document.")
                 
-                if text:
-                    st.subheader("Extracted Text")
-                    st.text_area("OCR Output", text, height=250)
-                    
-                    st.subheader("AI Summary")
-                    if llm is None:
-                        st.warning("LLM not configured. Set GROQ_API_KEY to enable AI summaries.")
-                    else:
-                        with st.spinner("Summarizing..."):
-                            try:
-                                summary = llm.ask([
-                                    {"role": "system", "content": "You are a clinical summarizer. Extract key diagnoses, procedures, and clinical findings."},
-                                    {"role": "user", "content": f"Summarize and extract diagnoses from this OCR text:\n{text[:4000]}"},
-                                ])
-                                st.write(summary)
-                            except LLMError as e:
-                                st.error(f"Failed to generate summary: {e}")
-                else:
-                    st.warning("No text could be extracted from the document.")
-                    
-            except OCRError as e:
-                st.error(f"OCR failed: {e}")
-            except Exception as e:
-                st.error(f"Unexpected error: {e}")
+        except OCRError as e:
+            st.error(f"OCR failed: {e}")
+        except Exception as e:
+            st.error(f"Unexpected error: {e}")
 # ==========================================================================================
 # CODE SUGGESTION PAGE
 # ==========================================================================================
 elif page == "Code Suggestion":
     st.header("ICD-10 / CPT-4 Code Suggestions")
-    st.caption("Enter a clinical description to find matching medical codes.")
+    st.caption("Enter clinical descriptions (one per line) to find matching medical codes.")
 
-    query = st.text_input("Describe diagnosis or procedure:", placeholder="e.g., fever, chest pain, appendectomy")
+    query = st.text_area(
+        "Describe diagnoses or procedures (one per line):",
+        placeholder="e.g., fever\nchest pain\nappendectomy"
+    )
+    # All entities are searched in one batch rather than one at a time
+    queries = [line.strip() for line in query.splitlines() if line.strip()]
 
     col1, col2 = st.columns(2)
     with col1:
@@ -302,52 +369,63 @@ elif page == "Code Suggestion":
             else:
                 return f"{score}% (Low)"
 
+    m = "hybrid" if method.startswith("hybrid") else \
+        ("semantic" if method.startswith("semantic") else "fuzzy")
+
+    def show_suggestions(label, batch):
+        """Render {query: [(code, desc, score)]} results under a subheader."""
+        st.subheader(f"{label} suggestions")
+        for q, results in batch.items():
+            if len(batch) > 1:
+                st.markdown(f"*{q}*")
+            if results:
+                for code, desc, score in results:
+                    score_display = format_score(score, "semantic" if m != "fuzzy" else "fuzzy")
+                    st.markdown(f"**{code}** - {desc}")
+                    st.caption(f"Confidence: {score_display}")
+            else:
+                st.info(f"No matching {label} codes found.")
+
     col_icd, col_cpt = st.columns(2)
     
     with col_icd:
         if st.button("Suggest ICD-10", use_container_width=True):
-            if not query.strip():
+            if not queries:
                 st.warning("Please enter a description or clinical text.")
             else:
                 with st.spinner("Searching ICD-10..."):
                     try:
-                        m = "hybrid" if method.startswith("hybrid") else \
-                            ("semantic" if method.startswith("semantic") else "fuzzy")
-                        icd_results = suggest_icd10(query, limit=topk, method=m)
-                        
-                        if icd_results:
-                            st.subheader("ICD-10 suggestions")
-                            for code, desc, score in icd_results:
-                                score_display = format_score(score, "semantic" if m != "fuzzy" else "fuzzy")
-                                st.markdown(f"**{code}** - {desc}")
-                                st.caption(f"Confidence: {score_display}")
-                        else:
-                            st.info("No matching ICD-10 codes found.")
+                        show_suggestions("ICD-10", cached_suggest_icd10(tuple(queries), limit=topk, method=m))
                     except Exception as e:
                         st.error(f"Search failed: {e}")
 
     with col_cpt:
         if st.button("Suggest CPT-4", use_container_width=True):
-            if not query.strip():
+            if not queries:
                 st.warning("Please enter a description or clinical text.")
             else:
                 with st.spinner("Searching CPT-4..."):
                     try:
-                        m = "hybrid" if method.startswith("hybrid") else \
-                            ("semantic" if method.startswith("semantic") else "fuzzy")
-                        cpt_results = suggest_cpt(query, limit=topk, method=m)
-                        
-                        if cpt_results:
-                            st.subheader("CPT-4 suggestions")
-                            for code, desc, score in cpt_results:
-                                score_display = format_score(score, "semantic" if m != "fuzzy" else "fuzzy")
-                                st.markdown(f"**{code}** - {desc}")
-                                st.caption(f"Confidence: {score_display}")
-                        else:
-                            st.info("No matching CPT-4 codes found.")
+                        show_suggestions("CPT-4", cached_suggest_cpt(tuple(queries), limit=topk, method=m))
                     except Exception as e:
                         st.error(f"Search failed: {e}")
 
+    # Both searches run concurrently: latency is the slower of the two
+    if st.button("Suggest both", use_container_width=True):
+        if not queries:
+            st.warning("Please enter a description or clinical text.")
+        else:
+            with st.spinner("Searching ICD-10 and CPT-4..."):
+                try:
+                    icd_batch, cpt_batch = cached_suggest_both(tuple(queries), limit=topk, method=m)
+                    both_icd, both_cpt = st.columns(2)
+                    with both_icd:
+                        show_suggestions("ICD-10", icd_batch)
+                    with both_cpt:
+                        show_suggestions("CPT-4", cpt_batch)
+                except Exception as e:
+                    st.error(f"Search failed: {e}")
+
 
 # ==========================================================================================
 # CLAIM GENERATOR PAGE
@@ -1,9 +1,16 @@
 # workflow.py
+import functools
 import json
+import mmap
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # semantic search
-from semantic_search import semantic_search_icd, semantic_search_cpt
+from semantic_search import (
+    semantic_search_icd, semantic_search_cpt,
+    semantic_search_icd_batch, semantic_search_cpt_batch,
+)
 
 # fuzzy fallback
 try:
@@ -16,26 +23,80 @@ except Exception:
     except Exception:
         raise ImportError("Install rapidfuzz or fuzzywuzzy: pip install rapidfuzz")
 
+# Optional: binary code maps, several times faster to parse than the JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Inside the Streamlit app, memoize suggestions across reruns and sessions;
+# other callers (CLI, scripts) get the plain functions and never import it
+if "streamlit" in sys.modules:
+    import streamlit as st
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    _cache_suggestions = st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+    _cache_resource = st.cache_resource(show_spinner=False)
+
+    def _worker_initializer():
+        # Hand the caller's script context to pool threads, so the cached
+        # functions called there don't warn about a missing ScriptRunContext
+        ctx = get_script_run_ctx(suppress_warning=True)
+        return functools.partial(add_script_run_ctx, ctx=ctx) if ctx is not None else None
+else:
+    def _cache_suggestions(func):
+        return func
+    _cache_resource = _cache_suggestions
+
+    def _worker_initializer():
+        return None
+
 # load maps
 ICD_PATH = Path("medical_codes/icd10.json")
 CPT_PATH = Path("medical_codes/cpt4.json")
 
+def _load_msgpack(path: Path):
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        return msgpack.unpackb(buf, raw=False, strict_map_key=False)
+
+@_cache_resource
 def load_map(path: Path):
+    """
+    Load a code -> description map. With msgpack installed, the JSON is
+    converted once to a .msgpack sibling which later loads read instead;
+    the sidecar is rebuilt whenever the JSON is newer.
+    """
     if not path.exists():
         raise FileNotFoundError(f"{path} not found. Run convert_codes.py or ensure file exists.")
+    packed = path.with_suffix(".msgpack")
+    if msgpack is not None:
+        try:
+            if packed.stat().st_mtime >= path.stat().st_mtime:
+                return _load_msgpack(packed)
+        except (OSError, ValueError):
+            pass  # missing, empty or corrupt sidecar: rebuild from the JSON
     with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+        data = json.load(f)
+    if msgpack is not None:
+        try:
+            packed.write_bytes(msgpack.packb(data, use_bin_type=True))
+        except OSError:
+            pass  # read-only checkout: keep using the JSON
+    return data
 
 ICD_MAP = load_map(ICD_PATH)
 CPT_MAP = load_map(CPT_PATH)
 
 ICD_KEYS = list(ICD_MAP.keys())
 ICD_SEARCH = [f"{k} {ICD_MAP[k]}" for k in ICD_KEYS]
+# fuzzywuzzy returns only the matched string: map it back to its index in O(1)
+ICD_SEARCH_INDEX = {s: i for i, s in enumerate(ICD_SEARCH)}
 
 CPT_KEYS = list(CPT_MAP.keys())
 CPT_SEARCH = [f"{k} {CPT_MAP[k]}" for k in CPT_KEYS]
+CPT_SEARCH_INDEX = {s: i for i, s in enumerate(CPT_SEARCH)}
 
 
+@_cache_suggestions
 def fuzzy_suggest_icd(query: str, limit: int = 5):
     if not query.strip():
         return []
@@ -46,11 +107,12 @@ def fuzzy_suggest_icd(query: str, limit: int = 5):
             match_str, score, idx = item
         else:
             match_str, score = item
-            idx = ICD_SEARCH.index(match_str)
+            idx = ICD_SEARCH_INDEX[match_str]
         code = ICD_KEYS[idx]
         out.append((code, ICD_MAP[code], int(score)))
     return out
 
+@_cache_suggestions
 def fuzzy_suggest_cpt(query: str, limit: int = 5):
     if not query.strip():
         return []
@@ -61,26 +123,61 @@ def fuzzy_suggest_cpt(query: str, limit: int = 5):
             match_str, score, idx = item
         else:
             match_str, score = item
-            idx = CPT_SEARCH.index(match_str)
+            idx = CPT_SEARCH_INDEX[match_str]
         code = CPT_KEYS[idx]
         out.append((code, CPT_MAP[code], int(score)))
     return out
 
+@_cache_suggestions
 def semantic_suggest_icd(query: str, top_k: int = 8):
     # returns (code, description, score) with score in [0,1]
     results = semantic_search_icd(query, top_k)
     return [(code, ICD_MAP.get(code, ""), round(score, 3)) for code, score in results]
 
+@_cache_suggestions
 def semantic_suggest_cpt(query: str, top_k: int = 8):
     results = semantic_search_cpt(query, top_k)
     return [(code, CPT_MAP.get(code, ""), round(score, 3)) for code, score in results]
 
+def semantic_suggest_icd_batch(queries, top_k: int = 8):
+    # one result list per query, from a single batched search
+    return [
+        [(code, ICD_MAP.get(code, ""), round(score, 3)) for code, score in results]
+        for results in semantic_search_icd_batch(queries, top_k)
+    ]
+
+def semantic_suggest_cpt_batch(queries, top_k: int = 8):
+    return [
+        [(code, CPT_MAP.get(code, ""), round(score, 3)) for code, score in results]
+        for results in semantic_search_cpt_batch(queries, top_k)
+    ]
+
 # Semantic search thresholds (cosine similarity scores are 0.0 to 1.0)
 # Below these thresholds, we augment with fuzzy search results
 SEMANTIC_THRESHOLD_ICD = 0.35  # Minimum acceptable semantic similarity for ICD codes
 SEMANTIC_THRESHOLD_CPT = 0.35  # Minimum acceptable semantic similarity for CPT codes
 
 
+def _hybrid_merge(sem, query: str, limit: int, threshold: float, fuzzy_fn):
+    """
+    Return the semantic results, or - if they are empty or the top score is
+    below threshold - the semantic and fuzzy matches merged by code. Fuzzy
+    scores are scaled to [0,1] so a code found by both keeps its best score,
+    and the merged list is ranked by that score.
+    """
+    top_score = sem[0][2] if sem else 0
+    if not sem or top_score < threshold:
+        merged = {code: (code, desc, score) for code, desc, score in sem}
+        for code, desc, score in fuzzy_fn(query, limit=limit):
+            score = round(score / 100, 3)
+            cur = merged.get(code)
+            if cur is None or score > cur[2]:
+                merged[code] = (code, desc, score)
+        return sorted(merged.values(), key=lambda t: t[2], reverse=True)[:limit]
+    
+    return sem[:limit]
+
+
 def suggest_icd10(query: str, limit: int = 5, method: str = "hybrid"):
     """
     Suggest ICD-10 codes for a given clinical query.
@@ -88,7 +185,8 @@ def suggest_icd10(query: str, limit: int = 5, method: str = "hybrid"):
     method: 'semantic', 'fuzzy', 'hybrid'
     - semantic: Uses embedding-based similarity search
     - fuzzy: Uses string matching (rapidfuzz/fuzzywuzzy)  
-    - hybrid: Combines both - semantic first, fuzzy for low-confidence results
+    - hybrid: Semantic, merged with fuzzy matches for low-confidence results
+              (fuzzy scores scaled to 0-1)
     """
     if not query or not query.strip():
         return []
@@ -99,24 +197,9 @@ def suggest_icd10(query: str, limit: int = 5, method: str = "hybrid"):
         return fuzzy_suggest_icd(query, limit=limit)
     
     # Hybrid approach: semantic first, augment with fuzzy if needed
-    sem = semantic_suggest_icd(query, top_k=limit * 2)  # Get more candidates
-    
-    # If semantic results are empty or top score is below threshold, add fuzzy
-    top_score = sem[0][2] if sem else 0
-    if not sem or top_score < SEMANTIC_THRESHOLD_ICD:
-        fuzzy = fuzzy_suggest_icd(query, limit=limit)
-        # Combine unique results, preserving order: semantic first
-        seen = set()
-        out = []
-        for t in sem + fuzzy:
-            if t[0] not in seen:
-                seen.add(t[0])
-                out.append(t)
-            if len(out) >= limit:
-                break
-        return out[:limit]
-    
-    return sem[:limit]
+    # Only `limit` semantic hits can reach the output: fetch no more
+    sem = semantic_suggest_icd(query, top_k=limit)
+    return _hybrid_merge(sem, query, limit, SEMANTIC_THRESHOLD_ICD, fuzzy_suggest_icd)
 
 
 def suggest_cpt(query: str, limit: int = 5, method: str = "hybrid"):
@@ -134,19 +217,58 @@ def suggest_cpt(query: str, limit: int = 5, method: str = "hybrid"):
         return fuzzy_suggest_cpt(query, limit=limit)
     
     # Hybrid approach
-    sem = semantic_suggest_cpt(query, top_k=limit * 2)
+    sem = semantic_suggest_cpt(query, top_k=limit)
+    return _hybrid_merge(sem, query, limit, SEMANTIC_THRESHOLD_CPT, fuzzy_suggest_cpt)
+
+
+def _suggest_batch(queries, limit, method, semantic_batch, fuzzy_fn, threshold):
+    """Shared batch logic: one batched semantic search, per-query fuzzy fallback."""
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return {}
     
-    top_score = sem[0][2] if sem else 0
-    if not sem or top_score < SEMANTIC_THRESHOLD_CPT:
-        fuzzy = fuzzy_suggest_cpt(query, limit=limit)
-        seen = set()
-        out = []
-        for t in sem + fuzzy:
-            if t[0] not in seen:
-                seen.add(t[0])
-                out.append(t)
-            if len(out) >= limit:
-                break
-        return out[:limit]
+    if method == "fuzzy":
+        return {q: fuzzy_fn(q, limit=limit) for q in queries}
+    if method == "semantic":
+        return dict(zip(queries, semantic_batch(queries, top_k=limit)))
     
-    return sem[:limit]
+    sems = semantic_batch(queries, top_k=limit)
+    return {
+        q: _hybrid_merge(sem, q, limit, threshold, fuzzy_fn)
+        for q, sem in zip(queries, sems)
+    }
+
+
+def suggest_icd10_batch(queries, limit: int = 5, method: str = "hybrid"):
+    """
+    Suggest ICD-10 codes for several clinical queries at once.
+    
+    Returns a dict mapping each non-empty query to its suggestions, as
+    suggest_icd10 would return them. Semantic lookups share one batch.
+    """
+    return _suggest_batch(queries, limit, method, semantic_suggest_icd_batch,
+                          fuzzy_suggest_icd, SEMANTIC_THRESHOLD_ICD)
+
+
+def suggest_cpt_batch(queries, limit: int = 5, method: str = "hybrid"):
+    """
+    Suggest CPT-4 codes for several procedure queries at once.
+    
+    Returns a dict mapping each non-empty query to its suggestions.
+    """
+    return _suggest_batch(queries, limit, method, semantic_suggest_cpt_batch,
+                          fuzzy_suggest_cpt, SEMANTIC_THRESHOLD_CPT)
+
+
+def both_suggest(queries, limit: int = 5, method: str = "hybrid"):
+    """
+    Suggest ICD-10 and CPT-4 codes for the same queries concurrently.
+    
+    The BERT forward pass and the NumPy scoring release the GIL, so two
+    threads bring latency down to the slower of the two searches.
+    Returns (icd_results, cpt_results), each as from the *_batch functions.
+    """
+    with ThreadPoolExecutor(max_workers=2, initializer=_worker_initializer()) as ex:
+        f_icd = ex.submit(suggest_icd10_batch, queries, limit, method)
+        f_cpt = ex.submit(suggest_cpt_batch, queries, limit, method)
+        return f_icd.result(), f_cpt.result()